@@ -0,0 +1,155 @@
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import DailyPoints, Profile
+
+ENTRY_FIELDS = ('user_id', 'user__username', 'total_points', 'badge')
+
+def _entry(row, rank):
+    return {
+        'rank': rank,
+        'user_id': row['user_id'],
+        'username': row['user__username'],
+        'total_points': row['total_points'],
+        'badge': row['badge']
+    }
+
+def _ranked(rows, first_rank, first_position):
+    """
+    Competition ranking ("1, 2, 2, 4") for consecutive rows ordered by points.
+    `first_rank` is the rank of the first row and `first_position` its
+    1-based position in the full ordering.
+    """
+    entries = []
+    for position, row in enumerate(rows, start=first_position):
+        if entries and row['total_points'] == entries[-1]['total_points']:
+            rank = entries[-1]['rank']
+        else:
+            rank = first_rank if not entries else position
+        entries.append(_entry(row, rank))
+    return entries
+
+def ordered_profiles():
+    # Served by the (-total_points, id) index on Profile
+    return Profile.objects.order_by('-total_points', 'id').values(*ENTRY_FIELDS)
+
+def rank_of_points(points):
+    """1 + the number of profiles with more points, counted on the index"""
+    return Profile.objects.filter(total_points__gt=points).count() + 1
+
+class Leaderboard:
+    """
+    Global leaderboard over Profile.total_points.
+    The top `size` entries are kept as an in-process snapshot that is rebuilt
+    after points change (and at least every `ttl` seconds, for changes made
+    by other processes). Deeper pages and personal ranks are answered with
+    index range scans and counts, so reads don't grow with the user count.
+    """
+
+    def __init__(self, size=100, ttl=30):
+        self.size = size
+        self.ttl = ttl
+        self._snapshot = None
+        self._built_at = 0
+        self._generation = 0  # bumped on invalidation so an in-flight rebuild isn't kept
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+
+    def top(self, limit=None):
+        limit = min(limit or self.size, self.size)
+        with self._lock:
+            snapshot = self._snapshot
+            fresh = snapshot is not None and time.monotonic() - self._built_at <= self.ttl
+            generation = self._generation
+        if not fresh:
+            snapshot = _ranked(ordered_profiles()[:self.size], 1, 1)
+            with self._lock:
+                if generation == self._generation:
+                    self._snapshot = snapshot
+                    self._built_at = time.monotonic()
+        return snapshot[:limit]
+
+    def page(self, offset, limit):
+        """Entries at positions offset+1 .. offset+limit"""
+        if offset + limit <= self.size:
+            return self.top(offset + limit)[offset:]
+        rows = list(ordered_profiles()[offset:offset + limit])
+        if not rows:
+            return []
+        return _ranked(rows, rank_of_points(rows[0]['total_points']), offset + 1)
+
+    def rank(self, user):
+        """The user's entry, with rank, or None if they have no profile"""
+        row = ordered_profiles().filter(user=user).first()
+        if row is None:
+            return None
+        return _entry(row, rank_of_points(row['total_points']))
+
+WINDOWS = ('week', 'month', 'all')
+
+def window_start(window, today=None):
+    """First day of the current calendar week or month; None for all time"""
+    today = today or timezone.now().date()
+    if window == 'week':
+        return today - timedelta(days=today.weekday())
+    if window == 'month':
+        return today.replace(day=1)
+    if window == 'all':
+        return None
+    raise ValueError(f"Unknown leaderboard window: {window}")
+
+class WindowedLeaderboard:
+    """
+    Leaderboard over the points earned in a time window, optionally among a
+    group of users. Totals are sums of the users' DailyPoints rollup rows in
+    the window (at most a month of rows per user), never of quiz attempts.
+    """
+
+    def __init__(self, window, user_ids=None):
+        self.window = window
+        self.start = window_start(window)
+        self.user_ids = user_ids
+
+    def totals(self):
+        rows = DailyPoints.objects.all()
+        if self.start:
+            rows = rows.filter(day__gte=self.start)
+        if self.user_ids is not None:
+            rows = rows.filter(user_id__in=self.user_ids)
+        return rows.values(
+            'user_id', 'user__username', badge=F('user__profile__badge')
+        ).annotate(total_points=Sum('points'))
+
+    def rank_of_points(self, points):
+        return self.totals().filter(total_points__gt=points).count() + 1
+
+    def page(self, offset, limit):
+        rows = list(self.totals().order_by('-total_points', 'user_id')[offset:offset + limit])
+        if not rows:
+            return []
+        return _ranked(rows, self.rank_of_points(rows[0]['total_points']), offset + 1)
+
+    def rank(self, user):
+        """The user's entry in the window; users without points in it have 0"""
+        row = self.totals().filter(user_id=user.id).order_by('user_id').first() or {
+            'user_id': user.id,
+            'user__username': user.username,
+            'badge': Profile.objects.filter(user=user).values_list('badge', flat=True).first(),
+            'total_points': 0
+        }
+        return _entry(row, self.rank_of_points(row['total_points']))
+
+leaderboard = Leaderboard(size=settings.LEADERBOARD_SIZE, ttl=settings.LEADERBOARD_TTL)
+
+@receiver(post_save, sender=Profile)
+def invalidate_leaderboard(sender, **kwargs):
+    leaderboard.invalidate()
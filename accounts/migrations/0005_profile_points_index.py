@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_userfollow'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-total_points', 'id'], name='profile_points_rank_idx'),
+        ),
+    ]
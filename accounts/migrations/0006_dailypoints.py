@@ -0,0 +1,65 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+def rollup_awarded_points(apps, schema_editor):
+    """
+    Daily totals from the points ledger. Awards are dated by their attempt's
+    last answer: the ones backfilled for attempts completed before the ledger
+    existed were all created when that migration ran.
+    """
+    PointsAward = apps.get_model('quiz', 'PointsAward')
+    Answer = apps.get_model('quiz', 'Answer')
+    DailyPoints = apps.get_model('accounts', 'DailyPoints')
+
+    last_answer = (
+        Answer.objects.filter(attempt=OuterRef('attempt'))
+        .order_by()
+        .values('attempt')
+        .annotate(last=Max('answered_at'))
+        .values('last')
+    )
+    days = (
+        PointsAward.objects
+        .annotate(day=TruncDate(Coalesce(Subquery(last_answer), 'created_at')))
+        .values('user', 'day')
+        .annotate(total=Sum('points'), count=Count('id'))
+        .order_by()
+    )
+    DailyPoints.objects.bulk_create([
+        DailyPoints(user_id=row['user'], day=row['day'], points=row['total'], quizzes=row['count'])
+        for row in days
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_profile_points_index'),
+        ('quiz', '0011_pointsaward'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+                ('quizzes', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'user', 'points'], name='daily_points_window_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailypoints',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='daily_points_user_day_unique'),
+        ),
+        migrations.RunPython(rollup_awarded_points, migrations.RunPython.noop),
+    ]
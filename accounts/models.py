@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from datetime import timedelta
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from django.conf import settings
 from django.utils import timezone
 from django.db.models.signals import post_save
@@ -18,6 +21,9 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+# Highest first: (minimum total points, badge)
+BADGE_THRESHOLDS = [(2500, 'gold'), (1500, 'silver'), (500, 'bronze')]
+
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     total_points = models.IntegerField(default=0)
@@ -35,35 +41,66 @@ class Profile(models.Model):
     current_streak = models.IntegerField(default=0)
     last_quiz_date = models.DateField(null=True, blank=True)
 
-    def update_badge(self):
-        if self.total_points >= 2500:
-            self.badge = 'gold'
-        elif self.total_points >= 1500:
-            self.badge = 'silver'
-        elif self.total_points >= 500:
-            self.badge = 'bronze'
-        else:
-            self.badge = 'none'
-        self.save()
-
-    def add_points(self, points):
-        self.total_points += points
-        self.update_badge()
+    class Meta:
+        indexes = [
+            # Leaderboard pages and "how many users have more points" counts
+            models.Index(fields=['-total_points', 'id'], name='profile_points_rank_idx')
+        ]
 
-    def update_streak(self):
+    @classmethod
+    def record_quiz(cls, user_id, points):
+        """
+        Add the points of a completed quiz and advance the streak in one UPDATE.
+        Everything is computed from the stored row, so concurrent awards can't
+        overwrite each other the way a read-modify-save would.
+        """
         today = timezone.now().date()
-        if self.last_quiz_date:
-            days_diff = (today - self.last_quiz_date).days
-            if days_diff == 1:  # consecutive day
-                self.current_streak += 1
-                self.highest_streak = max(self.current_streak, self.highest_streak)
-            elif days_diff > 1:  # streak broken
-                self.current_streak = 1
-        else:
-            self.current_streak = 1
-        
-        self.last_quiz_date = today
-        self.save()
+        yesterday = today - timedelta(days=1)
+        new_streak = Case(
+            When(last_quiz_date=yesterday, then=F('current_streak') + 1),
+            When(last_quiz_date__gte=today, then=F('current_streak')),
+            default=Value(1)
+        )
+        return cls.objects.filter(user_id=user_id).update(
+            total_points=F('total_points') + points,
+            badge=Case(
+                *[When(total_points__gte=minimum - points, then=Value(badge)) for minimum, badge in BADGE_THRESHOLDS],
+                default=Value('none')
+            ),
+            current_streak=new_streak,
+            highest_streak=Greatest(F('highest_streak'), new_streak),
+            last_quiz_date=today
+        )
+
+class DailyPoints(models.Model):
+    """Points earned by a user on one day; windowed leaderboards sum these rollup rows"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_points')
+    day = models.DateField()
+    points = models.IntegerField(default=0)
+    quizzes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='daily_points_user_day_unique')
+        ]
+        indexes = [
+            # Window scans read every row of a date range
+            models.Index(fields=['day', 'user', 'points'], name='daily_points_window_idx')
+        ]
+
+    @classmethod
+    def record(cls, user_id, points, day=None):
+        """Add one completed quiz to the user's row for `day` (today by default)"""
+        day = day or timezone.now().date()
+        increments = {'points': F('points') + points, 'quizzes': F('quizzes') + 1}
+        if cls.objects.filter(user_id=user_id, day=day).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, day=day, points=points, quizzes=1)
+        except IntegrityError:
+            # Another worker created today's row first
+            cls.objects.filter(user_id=user_id, day=day).update(**increments)
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_user_profile(sender, instance, created, **kwargs):
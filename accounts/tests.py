@@ -1,3 +1,126 @@
+from datetime import timedelta
+from importlib import import_module
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .leaderboard import Leaderboard, WindowedLeaderboard, leaderboard
+from .models import DailyPoints, Profile, UserFollow
 
-# Create your tests here.
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        leaderboard.invalidate()
+        self.users = []
+        for index, points in enumerate([50, 300, 120, 300, 0, 75]):
+            user = get_user_model().objects.create_user(
+                username=f"user{index}", email=f"user{index}@example.com", password='password'
+            )
+            Profile.objects.filter(user=user).update(total_points=points)
+            self.users.append(user)
+        self.board = Leaderboard(size=3)
+
+    def test_top_uses_competition_ranking(self):
+        self.assertEqual(
+            [(entry['username'], entry['rank']) for entry in self.board.top()],
+            [('user1', 1), ('user3', 1), ('user2', 3)]
+        )
+
+    def test_top_is_served_from_the_snapshot_until_points_change(self):
+        self.board.top()
+        with self.assertNumQueries(0):
+            self.board.top(2)
+
+        Profile.objects.filter(user=self.users[4]).update(total_points=1000)
+        self.board.invalidate()
+        self.assertEqual(self.board.top(1)[0]['username'], 'user4')
+
+    def test_pages_past_the_snapshot(self):
+        entries = self.board.page(3, 3)
+        self.assertEqual(
+            [(entry['username'], entry['rank']) for entry in entries],
+            [('user5', 4), ('user0', 5), ('user4', 6)]
+        )
+        self.assertEqual(self.board.page(6, 3), [])
+
+    def test_rank(self):
+        self.assertEqual(self.board.rank(self.users[2])['rank'], 3)
+        self.assertEqual(self.board.rank(self.users[3])['rank'], 1)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.board.rank(self.users[4])['rank'], 6)
+
+    def test_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+
+        response = client.get(reverse('leaderboard'), {'limit': 2})
+        self.assertEqual([entry['username'] for entry in response.data['results']], ['user1', 'user3'])
+        self.assertEqual(response.data['next_offset'], 2)
+
+        response = client.get(reverse('user-points'))
+        self.assertEqual((response.data['total_points'], response.data['rank']), (50, 5))
+
+class WindowedLeaderboardTests(TestCase):
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(username=f"user{index}", email=f"user{index}@example.com", password='password')
+            for index in range(3)
+        ]
+        today = timezone.now().date()
+        last_month = today.replace(day=1) - timedelta(days=40)
+        for user, day, points in [
+            (self.users[0], today, 30), (self.users[0], last_month, 500),
+            (self.users[1], today, 20), (self.users[1], today - timedelta(days=today.weekday()), 20),
+            (self.users[2], last_month, 90),
+        ]:
+            DailyPoints.record(user.id, points, day=day)
+
+    def test_record_accumulates_per_day(self):
+        DailyPoints.record(self.users[0].id, 10)
+        row = DailyPoints.objects.get(user=self.users[0], day=timezone.now().date())
+        self.assertEqual((row.points, row.quizzes), (40, 2))
+
+    def test_windows_sum_rollup_rows(self):
+        week = WindowedLeaderboard('week').page(0, 10)
+        self.assertEqual([(entry['username'], entry['total_points']) for entry in week][:2], [('user1', 40), ('user0', 30)])
+        everything = WindowedLeaderboard('all').page(0, 10)
+        self.assertEqual([entry['username'] for entry in everything], ['user0', 'user2', 'user1'])
+
+    def test_rank_within_a_group(self):
+        board = WindowedLeaderboard('month', user_ids=[self.users[0].id, self.users[2].id])
+        self.assertEqual([entry['username'] for entry in board.page(0, 10)], ['user0'])
+        entry = board.rank(self.users[2])
+        self.assertEqual((entry['total_points'], entry['rank']), (0, 2))
+
+    def test_following_scope(self):
+        UserFollow.objects.create(follower=self.users[2], following=self.users[0])
+        client = APIClient()
+        client.force_authenticate(self.users[2])
+        response = client.get(reverse('leaderboard'), {'window': 'all', 'scope': 'following'})
+        self.assertEqual([entry['username'] for entry in response.data['results']], ['user0', 'user2'])
+        self.assertEqual(client.get(reverse('leaderboard'), {'window': 'year'}).status_code, 400)
+
+class DailyPointsRollupTests(TestCase):
+    def test_backfilled_awards_are_dated_by_their_last_answer(self):
+        from quiz.models import Answer, PointsAward, Question, Quiz, QuizAttempt, Story
+        rollup = import_module('accounts.migrations.0006_dailypoints').rollup_awarded_points
+
+        user = get_user_model().objects.create_user(username='old', email='old@example.com', password='password')
+        story = Story.objects.create(user=user, title='Sorting', generated_story='Sorting.', difficulty='easy')
+        quiz = Quiz.objects.create(story=story, title='Sorting quiz')
+        question = Question.objects.create(quiz=quiz, question_text='Stable?', correct_answer='A')
+        attempt = QuizAttempt.objects.create(user=user, quiz=quiz)
+        Answer.objects.create(attempt=attempt, question=question, user_answer='A', is_correct=True)
+        answered = timezone.now() - timedelta(days=90)
+        Answer.objects.update(answered_at=answered)
+        # Ledger rows: one backfilled for the old attempt, one whose attempt was deleted
+        PointsAward.objects.create(user=user, attempt=attempt, points=10)
+        PointsAward.objects.create(user=user, attempt=None, points=5)
+
+        rollup(django_apps, None)
+
+        self.assertEqual(
+            sorted(DailyPoints.objects.filter(user=user).values_list('day', 'points')),
+            [(answered.date(), 10), (timezone.now().date(), 5)]
+        )
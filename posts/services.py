@@ -1,15 +1,10 @@
 import os
-import google.generativeai as genai
-from django.conf import settings
+from studentapp_backend import llm
 from .models import Tag, PostTag
 
-def initialize_gemini():
-    genai.configure(api_key=settings.GEMINI_API_KEY)
-    return genai.GenerativeModel('gemini-pro-vision')
+TAGGING_MODEL_NAME = 'gemini-pro-vision'
 
 def extract_tags_from_post(content, image_path=None):
-    model = initialize_gemini()
-    
     prompt = """
     Analyze the following post content and extract relevant academic tags.
     Consider the subject area, topics, and concepts mentioned.
@@ -18,12 +13,13 @@ def extract_tags_from_post(content, image_path=None):
     """
     
     if image_path and os.path.exists(image_path):
-        image_parts = [{"mime_type": "image/jpeg", "data": open(image_path, "rb").read()}]
-        response = model.generate_content([prompt, content, *image_parts])
+        with open(image_path, "rb") as image_file:
+            image_parts = [{"mime_type": "image/jpeg", "data": image_file.read()}]
+        response_text = llm.generate([prompt, content, *image_parts], model=TAGGING_MODEL_NAME)
     else:
-        response = model.generate_content([prompt, content])
+        response_text = llm.generate([prompt, content], model=TAGGING_MODEL_NAME)
     
-    tags_text = response.text.strip()
+    tags_text = response_text.strip()
     tags = [tag.strip() for tag in tags_text.split(',')]
     
     return tags
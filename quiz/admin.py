@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Story, Quiz, Question, QuizAttempt, Answer
+from .models import Story, Quiz, Question, QuizAttempt, Answer, QuizGenerationJob, PooledQuestion, PointsAward
 
 @admin.register(Story)
 class StoryAdmin(admin.ModelAdmin):
@@ -35,3 +35,23 @@ class AnswerAdmin(admin.ModelAdmin):
     list_filter = ('is_correct', 'answered_at')
     search_fields = ('attempt__user__username', 'question__question_text')
     date_hierarchy = 'answered_at'
+
+@admin.register(QuizGenerationJob)
+class QuizGenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('story', 'user', 'status', 'stage', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('story__title', 'user__username', 'user__email')
+    date_hierarchy = 'created_at'
+
+@admin.register(PooledQuestion)
+class PooledQuestionAdmin(admin.ModelAdmin):
+    list_display = ('story', 'difficulty', 'question_text', 'times_used', 'prompt_version', 'created_at')
+    list_filter = ('difficulty', 'prompt_version', 'created_at')
+    search_fields = ('question_text', 'story__title')
+    date_hierarchy = 'created_at'
+
+@admin.register(PointsAward)
+class PointsAwardAdmin(admin.ModelAdmin):
+    list_display = ('user', 'attempt', 'points', 'created_at')
+    search_fields = ('user__username', 'user__email')
+    date_hierarchy = 'created_at'
@@ -0,0 +1,117 @@
+import bisect
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Question
+
+OPTION_LETTERS = ('A', 'B', 'C', 'D')
+UNGRADABLE = ' '  # stands in for a missing correct letter; no stripped answer equals it
+
+def answer_letter(correct_answer):
+    """The option letter a stored correct answer starts with ("B) Merge sort" -> "B")"""
+    letter = correct_answer[:1]
+    return letter if letter in OPTION_LETTERS else UNGRADABLE
+
+class AnswerKey:
+    """
+    Compact answer key of one quiz: sorted question ids in an array and the
+    correct letters in a bytes string at the same positions.
+    """
+    __slots__ = ('_ids', '_letters')
+
+    def __init__(self, pairs):
+        pairs = sorted(pairs)
+        self._ids = array('q', (question_id for question_id, _ in pairs))
+        self._letters = ''.join(answer_letter(letter) for _, letter in pairs).encode('ascii')
+
+    def _index(self, question_id):
+        index = bisect.bisect_left(self._ids, question_id)
+        if index < len(self._ids) and self._ids[index] == question_id:
+            return index
+        return None
+
+    def __contains__(self, question_id):
+        return self._index(question_id) is not None
+
+    def __getitem__(self, question_id):
+        index = self._index(question_id)
+        if index is None:
+            raise KeyError(question_id)
+        return chr(self._letters[index])
+
+    def __len__(self):
+        return len(self._ids)
+
+class AnswerKeyCache:
+    """
+    Answer keys of recently graded quizzes, so grading and the "all questions
+    answered" check never touch the Question table.
+    A key is loaded with one query the first time its quiz is graded and kept
+    in an LRU bounded by quiz count. Saving or deleting a question drops its
+    quiz's key in this process; `ttl` bounds how long other processes can
+    keep grading against an outdated key.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._keys = OrderedDict()  # quiz id -> (loaded_at, answer key)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, quiz_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._keys.get(quiz_id)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._keys.move_to_end(quiz_id)
+                self._counters['hits'] += 1
+                return entry[1]
+            self._counters['misses'] += 1
+
+        answer_key = AnswerKey(
+            (question_id, correct_answer.strip().upper())
+            for question_id, correct_answer in Question.objects.filter(quiz_id=quiz_id).values_list('id', 'correct_answer')
+        )
+        if len(answer_key):
+            with self._lock:
+                self._keys[quiz_id] = (now, answer_key)
+                self._keys.move_to_end(quiz_id)
+                while len(self._keys) > self.max_entries:
+                    self._keys.popitem(last=False)
+                    self._counters['evictions'] += 1
+        return answer_key
+
+    def invalidate(self, quiz_id):
+        with self._lock:
+            if self._keys.pop(quiz_id, None) is not None:
+                self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._keys)
+        lookups = counters['hits'] + counters['misses']
+        return {
+            **counters,
+            'hit_rate': counters['hits'] / lookups if lookups else 0,
+            'entries': entries
+        }
+
+answer_keys = AnswerKeyCache(settings.ANSWER_KEY_CACHE_SIZE, ttl=settings.ANSWER_KEY_CACHE_TTL)
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_answer_key(sender, instance, **kwargs):
+    answer_keys.invalidate(instance.quiz_id)
+    # A concurrent grader may reload the old key before this transaction commits
+    transaction.on_commit(lambda: answer_keys.invalidate(instance.quiz_id))
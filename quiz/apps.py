@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class QuizConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz'
+
+    def ready(self):
+        # Registers the signals that drop cached answer keys when questions change
+        from . import answer_keys  # noqa: F401
+
+        if settings.EMOTION_PRELOAD:
+            from .emotion_inference import emotion_model
+            emotion_model.preload()
@@ -0,0 +1,69 @@
+import re
+
+# Rough token estimate; Gemini averages about 4 characters per token for English text
+CHARS_PER_TOKEN = 4
+
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+# "Chapter 3", "Section 2.1", "3.4 Binary trees", "UNIT IV" and similar section headings
+HEADING_RE = re.compile(
+    r'^\s*(?:(?:chapter|section|unit|part|lesson)\s+[\dIVXLC]+\b|\d+(?:\.\d+)*\.?\s+[A-Z])',
+    re.IGNORECASE
+)
+SENTENCE_END_RE = re.compile(r'[.!?]\s')
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _sections(text):
+    """Split on blank lines and before heading lines"""
+    for paragraph in PARAGRAPH_RE.split(text):
+        lines = []
+        for line in paragraph.splitlines():
+            if lines and HEADING_RE.match(line):
+                yield '\n'.join(lines).strip()
+                lines = []
+            lines.append(line)
+        yield '\n'.join(lines).strip()
+
+def _cut(text, max_chars):
+    """Index to cut an oversized section at: the last sentence end, else the last space"""
+    cut = 0
+    for match in SENTENCE_END_RE.finditer(text, 0, max_chars):
+        cut = match.end()
+    return cut or text.rfind(' ', 0, max_chars) + 1 or max_chars
+
+def _pieces(text, max_chars):
+    for section in _sections(text):
+        while len(section) > max_chars:
+            cut = _cut(section, max_chars)
+            yield section[:cut].strip()
+            section = section[cut:].strip()
+        if section:
+            yield section
+
+def split_text(text, max_tokens):
+    """
+    Split text into chunks of at most `max_tokens` (estimated).
+    Sections are packed greedily in order, so chunk boundaries fall on paragraph
+    breaks and headings; only sections bigger than a whole chunk are split, at
+    a sentence end where possible.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current, size = [], 0
+    for piece in _pieces(text, max_chars):
+        if current and size + len(piece) > max_chars:
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+def spread(chunks, limit):
+    """Pick at most `limit` evenly spaced chunks so questions still span the whole document"""
+    if len(chunks) <= limit:
+        return chunks
+    step = len(chunks) / limit
+    return [chunks[int(index * step)] for index in range(limit)]
@@ -0,0 +1,218 @@
+"""
+Emotion detection on camera frames streamed by quiz clients.
+
+OpenCV, DeepFace and TensorFlow are imported only when frames are decoded
+or the model is loaded, so importing the quiz app doesn't pull in the CV
+stack. Web processes set EMOTION_PRELOAD to build and warm the model at
+startup instead of on the first frames.
+"""
+import base64
+import binascii
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from django.conf import settings
+
+EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+def decode_frame(data, max_side=None):
+    """
+    A JPEG/PNG frame, as bytes or base64 (optionally a data: URL), decoded
+    to a BGR array and downscaled so its longest side is at most `max_side`.
+    Returns None when the data isn't an image.
+    """
+    import cv2
+    import numpy as np
+
+    if isinstance(data, str):
+        try:
+            data = base64.b64decode(data.split(',', 1)[-1] if data.startswith('data:') else data, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if data else None
+    if frame is None:
+        return None
+
+    height, width = frame.shape[:2]
+    if max_side and max(height, width) > max_side:
+        scale = max_side / max(height, width)
+        frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    return frame
+
+def analyze_frames(frames):
+    """
+    Emotion scores (percentages by label) of the main face in each frame.
+    Faces are found frame by frame, then classified together in one batched
+    forward pass of the emotion model instead of one model call per frame.
+    """
+    import numpy as np
+    from deepface import DeepFace
+    from deepface.modules import preprocessing
+
+    faces = []
+    for frame in frames:
+        # Without enforce_detection a frame with no face is classified whole, as before
+        face = DeepFace.extract_faces(frame, detector_backend='opencv', enforce_detection=False, color_face='bgr')[0]['face']
+        # resize_image returns a batch of one, shaped (1, 224, 224, 3)
+        faces.append(preprocessing.resize_image(face, target_size=(224, 224))[0])
+
+    model = DeepFace.build_model('Emotion', task='facial_attribute')
+    predictions = np.atleast_2d(model.predict(np.stack(faces)))
+    return [
+        {label: float(100 * score / row.sum()) for label, score in zip(EMOTION_LABELS, row)}
+        for row in predictions
+    ]
+
+class EmotionModel:
+    """
+    The emotion model and face detector of this process, built once and
+    warmed with a blank frame before serving, so no quiz pays for loading
+    weights or the first (graph-building) forward pass.
+    State goes unloaded -> loading -> ready, or failed (retried on next load).
+    """
+
+    def __init__(self):
+        self.state = 'unloaded'
+        self.error = ''
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def _build(self):
+        import numpy as np
+        from deepface import DeepFace
+
+        DeepFace.build_model('opencv', task='face_detector')
+        DeepFace.build_model('Emotion', task='facial_attribute')
+        analyze_frames([np.zeros((48, 48, 3), dtype=np.uint8)])
+
+    def load(self):
+        """Build and warm the model unless that's done; concurrent callers wait for one load"""
+        with self._lock:
+            if self.ready:
+                return
+            self.state = 'loading'
+            started = time.perf_counter()
+            try:
+                self._build()
+            except Exception as e:
+                print(f"Error loading the emotion model: {str(e)}")
+                self.state, self.error = 'failed', str(e)
+                raise
+            self.state, self.error = 'ready', ''
+            self.load_seconds = round(time.perf_counter() - started, 2)
+
+    def preload(self):
+        """Start loading in the background, if it hasn't started yet"""
+        if self.state in ('unloaded', 'failed'):
+            self.state = 'loading'
+            threading.Thread(target=self._load_quietly, name='emotion-model-load', daemon=True).start()
+
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception:
+            pass  # recorded in state and error
+
+    def analyze(self, frames):
+        self.load()
+        return analyze_frames(frames)
+
+    def status(self):
+        return {'state': self.state, 'error': self.error, 'load_seconds': self.load_seconds}
+
+class InferenceBatcher:
+    """
+    Runs the frames submitted by concurrent requests through `analyze` in
+    batches: each of a fixed pool of `workers` threads takes submissions off
+    a shared queue until it has `batch_size` frames or the oldest one has
+    waited `max_wait` seconds, then makes one `analyze` call for all of them.
+    Every submission gets a Future resolving to the results of its own frames.
+    """
+
+    def __init__(self, analyze, batch_size=16, max_wait=0.05, workers=1):
+        self.analyze = analyze
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.workers = workers
+        self._queue = Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._counters = {'batches': 0, 'frames': 0, 'errors': 0}
+
+    def submit(self, frames):
+        future = Future()
+        if not frames:
+            future.set_result([])
+            return future
+        with self._lock:
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(target=self._run, name=f'emotion-inference-{index}', daemon=True)
+                    for index in range(self.workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+        self._queue.put((frames, future))
+        return future
+
+    def _next_batch(self, pending):
+        """Submissions for one model call, starting with the one left over from the last batch"""
+        batch = [pending or self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.batch_size:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except Empty:
+                break
+            if size + len(item[0]) > self.batch_size:
+                return batch, item
+            batch.append(item)
+            size += len(item[0])
+        return batch, None
+
+    def _run(self):
+        pending = None
+        while True:
+            batch, pending = self._next_batch(pending)
+            frames = [frame for submitted, _ in batch for frame in submitted]
+            try:
+                results = self.analyze(frames)
+            except Exception as e:
+                print(f"Error analyzing {len(frames)} frames: {str(e)}")
+                with self._lock:
+                    self._counters['errors'] += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._counters['batches'] += 1
+                self._counters['frames'] += len(frames)
+            start = 0
+            for submitted, future in batch:
+                future.set_result(results[start:start + len(submitted)])
+                start += len(submitted)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            'mean_batch_size': counters['frames'] / counters['batches'] if counters['batches'] else 0,
+            'queued': self._queue.qsize()
+        }
+
+emotion_model = EmotionModel()
+
+emotion_batcher = InferenceBatcher(
+    emotion_model.analyze,
+    batch_size=settings.EMOTION_BATCH_SIZE,
+    max_wait=settings.EMOTION_BATCH_WAIT,
+    workers=settings.EMOTION_INFERENCE_WORKERS
+)
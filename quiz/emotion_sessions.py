@@ -0,0 +1,240 @@
+from django.conf import settings
+from django.db import transaction
+import os
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from .emotion_inference import EMOTION_LABELS
+from .models import EmotionAggregate, QuizAttempt
+
+def timestamp_ms(value):
+    """A client timestamp (epoch milliseconds or ISO 8601) in epoch milliseconds; now when missing or unreadable"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return int(parsed.timestamp() * 1000)
+    return time.time_ns() // 1_000_000
+
+class EmotionStats:
+    """Running count, mean and variance (Welford's method) of each emotion's score"""
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = [0.0] * len(EMOTION_LABELS)
+        self.m2 = [0.0] * len(EMOTION_LABELS)
+
+    def add(self, emotions):
+        self.count += 1
+        for index, label in enumerate(EMOTION_LABELS):
+            value = emotions.get(label, 0.0)
+            delta = value - self.mean[index]
+            self.mean[index] += delta / self.count
+            self.m2[index] += delta * (value - self.mean[index])
+
+    def dump(self):
+        return [self.count, self.mean, self.m2]
+
+    @classmethod
+    def load(cls, dumped):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = dumped
+        return stats
+
+    @property
+    def std(self):
+        return [math.sqrt(m2 / self.count) for m2 in self.m2]
+
+    def summary(self):
+        return {
+            'frames': self.count,
+            'average_emotions': dict(zip(EMOTION_LABELS, self.mean)),
+            'emotion_std': dict(zip(EMOTION_LABELS, self.std)),
+            'dominant_emotion': EMOTION_LABELS[max(range(len(self.mean)), key=self.mean.__getitem__)]
+        }
+
+class EmotionSession:
+    """
+    Emotion statistics of one quiz attempt, built from the frames its client
+    streams. Frames are folded into running statistics for the whole attempt
+    and for each question they were tagged with, and a fixed-size uniform
+    sample of raw frames is kept (reservoir sampling), so the state stays
+    constant in size however long the quiz runs and a summary never rescans
+    frames. The state round-trips through `dump`/`load` so any process can
+    carry on from where another left off.
+    """
+
+    def __init__(self, attempt_id, sample_size=100):
+        self.attempt_id = attempt_id
+        self.overall = EmotionStats()
+        self.questions = {}  # question id -> EmotionStats
+        self.sample = []
+        self.sample_size = sample_size
+        self._random = random.Random(attempt_id)
+        self._lock = threading.Lock()
+
+    def dump(self):
+        with self._lock:
+            return {
+                'overall': self.overall.dump(),
+                'questions': {str(question_id): stats.dump() for question_id, stats in self.questions.items()},
+                'sample': self.sample
+            }
+
+    @classmethod
+    def load(cls, attempt_id, dumped, sample_size=100):
+        session = cls(attempt_id, sample_size)
+        session.overall = EmotionStats.load(dumped['overall'])
+        session.questions = {int(question_id): EmotionStats.load(stats) for question_id, stats in dumped['questions'].items()}
+        session.sample = dumped['sample']
+        # Continue the reservoir with a fresh but reproducible sequence, not the one the last batch used
+        session._random = random.Random(f"{attempt_id}:{session.overall.count}")
+        return session
+
+    def add_results(self, results, timestamps=None, question_id=None):
+        """Record the emotions detected in a batch of frames, optionally all shown the same question"""
+        timestamps = timestamps or []
+        with self._lock:
+            for index, emotions in enumerate(results):
+                if not emotions:
+                    continue
+                self.overall.add(emotions)
+                if question_id is not None:
+                    self.questions.setdefault(question_id, EmotionStats()).add(emotions)
+
+                entry = {
+                    'timestamp': timestamp_ms(timestamps[index] if index < len(timestamps) else None),
+                    'question_id': question_id,
+                    'emotions': emotions
+                }
+                if len(self.sample) < self.sample_size:
+                    self.sample.append(entry)
+                else:
+                    slot = self._random.randrange(self.overall.count)
+                    if slot < self.sample_size:
+                        self.sample[slot] = entry
+
+    def get_emotion_summary(self, include_sample=True):
+        """Summary of the emotions detected so far, or None before any frame"""
+        with self._lock:
+            if not self.overall.count:
+                return None
+            overall = self.overall.summary()
+            summary = {
+                'average_emotions': overall['average_emotions'],
+                'emotion_std': overall['emotion_std'],
+                'dominant_emotion': overall['dominant_emotion'],
+                'total_frames_analyzed': overall['frames'],
+                'questions': {str(question_id): stats.summary() for question_id, stats in self.questions.items()}
+            }
+            if include_sample:
+                summary['frame_sample'] = sorted(self.sample, key=lambda entry: entry['timestamp'])
+        return summary
+
+    def save_emotion_data(self):
+        """
+        Write the attempt's statistics and frame sample to a binary emotion
+        data file (see emotion_storage). Returns its name under MEDIA_ROOT,
+        or None when no frames were analyzed.
+        """
+        from .emotion_storage import OVERALL, write_emotion_file
+
+        with self._lock:
+            if not self.overall.count:
+                return None
+            segments = [
+                (question_id, stats.count, stats.mean, stats.std)
+                for question_id, stats in [(OVERALL, self.overall), *self.questions.items()]
+            ]
+            frames = [
+                (
+                    entry['timestamp'],
+                    OVERALL if entry['question_id'] is None else entry['question_id'],
+                    [entry['emotions'].get(label, 0.0) for label in EMOTION_LABELS]
+                )
+                for entry in sorted(self.sample, key=lambda entry: entry['timestamp'])
+            ]
+
+        # Create directory if it doesn't exist
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'emotion_data'), exist_ok=True)
+
+        name = f'emotion_data/emotion_data_{self.attempt_id}.emo'
+        write_emotion_file(os.path.join(settings.MEDIA_ROOT, name), segments, frames)
+        return name
+
+class EmotionSessionStore:
+    """
+    Emotion sessions of the attempts in progress, kept in the database
+    (EmotionAggregate) rather than in a web process, so the frames of one
+    attempt can be posted to, summarized by and saved from any worker.
+    Each batch of results is folded into the stored state while the attempt
+    row is locked, and closing a session on completion takes the same lock,
+    so concurrent batches are all counted and frames that arrive after the
+    attempt completed are dropped instead of starting a new session.
+    """
+
+    def __init__(self, sample_size=100):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._counters = {'batches': 0, 'closed': 0, 'dropped': 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _load(self, attempt_id, aggregate):
+        return EmotionSession.load(attempt_id, aggregate.state, self.sample_size) if aggregate else None
+
+    def _lock_attempt(self, attempt_id):
+        """Lock the attempt's row for the rest of the transaction; returns whether it is completed (None if it's gone)"""
+        return QuizAttempt.objects.select_for_update().filter(id=attempt_id).values_list('completed', flat=True).first()
+
+    def record(self, attempt_id, results, timestamps=None, question_id=None):
+        """Add a batch of frame results to the attempt's session; False if the attempt was completed meanwhile"""
+        with transaction.atomic():
+            if self._lock_attempt(attempt_id) in (None, True):
+                self._count('dropped')
+                return False
+            aggregate = EmotionAggregate.objects.filter(attempt_id=attempt_id).first()
+            session = self._load(attempt_id, aggregate) or EmotionSession(attempt_id, self.sample_size)
+            session.add_results(results, timestamps, question_id)
+            if aggregate is None:
+                EmotionAggregate.objects.create(attempt_id=attempt_id, state=session.dump())
+            else:
+                aggregate.state = session.dump()
+                aggregate.save(update_fields=['state', 'updated_at'])
+        self._count('batches')
+        return True
+
+    def find(self, attempt_id):
+        """The attempt's session as stored, or None before its first frames"""
+        return self._load(attempt_id, EmotionAggregate.objects.filter(attempt_id=attempt_id).first())
+
+    def close(self, attempt_id):
+        """
+        Remove and return the session of a completed attempt, if it has one.
+        Completion was committed under the attempt's lock, so no batch can be
+        added once it has been read.
+        """
+        aggregate = EmotionAggregate.objects.filter(attempt_id=attempt_id).first()
+        if aggregate is None:
+            return None
+        aggregate.delete()
+        self._count('closed')
+        return self._load(attempt_id, aggregate)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {**counters, 'active': EmotionAggregate.objects.count()}
+
+emotion_sessions = EmotionSessionStore(sample_size=settings.EMOTION_SESSION_SAMPLE_SIZE)
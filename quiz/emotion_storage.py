@@ -0,0 +1,96 @@
+"""
+Compact binary files for the emotion data of quiz attempts.
+
+A file is a 16-byte header (magic, version, segment and frame counts)
+followed by packed little-endian records: first the segments (frame count,
+mean and standard deviation of each emotion, for the whole attempt and for
+each question), then the frames (epoch-millisecond timestamp, question id and
+the emotion scores as float32, in EMOTION_LABELS order). The reader
+memory-maps the records, so opening a file reads only its header and
+analytics work on the arrays directly.
+"""
+import struct
+import numpy as np
+from .emotion_inference import EMOTION_LABELS
+
+MAGIC = b'EMOT'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxII')
+OVERALL = -1  # question id of the whole-attempt segment and of frames not tagged with a question
+
+SEGMENT_DTYPE = np.dtype([
+    ('question_id', '<i8'),
+    ('frames', '<i8'),
+    ('mean', '<f4', (len(EMOTION_LABELS),)),
+    ('std', '<f4', (len(EMOTION_LABELS),))
+])
+FRAME_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('question_id', '<i8'),
+    ('emotions', '<f4', (len(EMOTION_LABELS),))
+])
+
+def write_emotion_file(path, segments, frames):
+    """Write segment and frame records, given as tuples in the field order of their dtypes"""
+    segments = np.array(segments, dtype=SEGMENT_DTYPE)
+    frames = np.array(frames, dtype=FRAME_DTYPE)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(segments), len(frames)))
+        f.write(segments.tobytes())
+        f.write(frames.tobytes())
+
+class EmotionSeries:
+    """Read-only, memory-mapped view of an emotion data file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:4] != MAGIC:
+            raise ValueError(f"{path} is not an emotion data file")
+        _, version, segment_count, frame_count = HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"Unsupported emotion data file version {version}")
+
+        self.segments = self._map(path, SEGMENT_DTYPE, HEADER.size, segment_count)
+        self.frames = self._map(path, FRAME_DTYPE, HEADER.size + segment_count * SEGMENT_DTYPE.itemsize, frame_count)
+
+    @staticmethod
+    def _map(path, dtype, offset, count):
+        if not count:
+            return np.empty(0, dtype=dtype)  # mmap can't map zero bytes
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+    @property
+    def timestamps(self):
+        return self.frames['timestamp']
+
+    @property
+    def emotions(self):
+        """(frames, emotions) float32 scores, columns in EMOTION_LABELS order"""
+        return self.frames['emotions']
+
+    def segment(self, question_id=OVERALL):
+        rows = self.segments[self.segments['question_id'] == question_id]
+        return rows[0] if len(rows) else None
+
+    def summary(self):
+        """The same shape as EmotionSession.get_emotion_summary(include_sample=False)"""
+        def stats(row):
+            return {
+                'frames': int(row['frames']),
+                'average_emotions': dict(zip(EMOTION_LABELS, row['mean'].tolist())),
+                'emotion_std': dict(zip(EMOTION_LABELS, row['std'].tolist())),
+                'dominant_emotion': EMOTION_LABELS[int(row['mean'].argmax())]
+            }
+
+        overall = self.segment()
+        if overall is None:
+            return None
+        overall = stats(overall)
+        return {
+            'average_emotions': overall['average_emotions'],
+            'emotion_std': overall['emotion_std'],
+            'dominant_emotion': overall['dominant_emotion'],
+            'total_frames_analyzed': overall['frames'],
+            'questions': {str(int(row['question_id'])): stats(row) for row in self.segments if row['question_id'] != OVERALL}
+        }
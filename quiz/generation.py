@@ -0,0 +1,226 @@
+import itertools
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from studentapp_backend import llm
+from .chunking import split_text, spread
+from .parsing import OPTION_FIELDS, parse_questions
+
+# Bump whenever the prompts or parsing change so cached question sets are regenerated
+PROMPT_VERSION = 4
+
+QUESTIONS_PER_QUIZ = 5
+
+# Per-chunk generation calls; the LLM client still caps how many run at once
+chunk_executor = ThreadPoolExecutor(
+    max_workers=settings.QUIZ_CHUNK_WORKERS,
+    thread_name_prefix='quiz-chunk'
+)
+
+# Enhanced prompts for better question generation
+DIFFICULTY_DESCRIPTIONS = {
+    'easy': "Generate 5 basic multiple-choice questions that test fundamental understanding. Focus on key terms, definitions, and basic concepts.",
+    'medium': "Generate 5 intermediate multiple-choice questions that require both understanding and application. Include questions that test relationships between concepts and practical applications.",
+    'hard': "Generate 5 challenging multiple-choice questions that require deep analysis. Include questions that combine multiple concepts and require critical thinking."
+}
+
+QUESTION_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'question': {'type': 'STRING'},
+            'options': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+            'answer': {'type': 'STRING', 'format': 'enum', 'enum': ['A', 'B', 'C', 'D']}
+        },
+        'required': ['question', 'options', 'answer']
+    }
+}
+
+JSON_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': QUESTION_SCHEMA
+}
+
+def variant_instruction(variant):
+    """Extra prompt line that makes alternative question sets for the same text differ"""
+    if not variant:
+        return ''
+    return f"\n\n        This is alternative question set #{variant + 1}: ask about different details than a first quiz on this text would."
+
+def build_json_prompt(text, difficulty, variant=0):
+    return f"""Based on the following text about algorithms and data structures, {DIFFICULTY_DESCRIPTIONS[difficulty]}{variant_instruction(variant)}
+
+        Rules for question generation:
+        1. Each question must have exactly 4 options, listed in A, B, C, D order
+        2. One and only one option should be correct
+        3. All options should be plausible but clearly distinguishable
+        4. Questions should be relevant to the text content
+        5. For medium difficulty:
+           - Include some questions about relationships between concepts
+           - Ask about practical applications
+           - Test understanding of processes and procedures
+
+        Respond with a JSON array. Each item has "question" (the question text),
+        "options" (the 4 option texts without letters) and "answer" (the correct letter).
+
+        Text to analyze:
+        {text}"""
+
+def build_simplified_prompt(text, variant=0):
+    return f"""Generate 5 multiple-choice questions about this text. Each question must have exactly 4 options (A, B, C, D) and one correct answer.{variant_instruction(variant)}
+
+                Format:
+                Q1. [Question]
+                A) [Option]
+                B) [Option]
+                C) [Option]
+                D) [Option]
+                Answer: [A/B/C/D]
+
+                Text: {text}"""
+
+def _strip_letter(option, letter):
+    option = option.strip()
+    for prefix in (f"{letter})", f"{letter}.", f"({letter})"):
+        if option.upper().startswith(prefix):
+            return option[len(prefix):].strip()
+    return option
+
+def _validate_item(item):
+    if not isinstance(item, dict):
+        return None
+    question_text = item.get('question') or item.get('question_text')
+    options = item.get('options')
+    answer = str(item.get('answer') or item.get('correct_answer') or '').strip().upper()[:1]
+
+    if isinstance(options, dict):
+        options = [options.get(letter) for letter in OPTION_FIELDS]
+    if (not isinstance(question_text, str) or not question_text.strip() or
+            not isinstance(options, list) or len(options) != 4 or
+            not all(isinstance(option, str) and option.strip() for option in options) or
+            answer not in OPTION_FIELDS):
+        return None
+
+    question = {'question_text': question_text.strip()}
+    for (letter, field), option in zip(OPTION_FIELDS.items(), options):
+        question[field] = _strip_letter(option, letter)
+    question['correct_answer'] = answer
+    return question
+
+def parse_json_questions(content):
+    """Validate a JSON response into question records; invalid items are skipped"""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return []
+    if isinstance(data, dict):
+        data = data.get('questions', [])
+    if not isinstance(data, list):
+        return []
+    return [question for question in map(_validate_item, data) if question]
+
+def question_key(question):
+    return ' '.join(re.findall(r'\w+', question['question_text'].lower()))
+
+def select_questions(candidate_sets, count=QUESTIONS_PER_QUIZ):
+    """
+    Merge per-chunk candidates into the final question list.
+    Takes one question from each chunk in turn so the quiz covers the whole
+    document, skipping questions whose wording repeats an earlier one.
+    """
+    selected = []
+    seen = set()
+    for question in itertools.chain.from_iterable(itertools.zip_longest(*candidate_sets)):
+        if question is None:
+            continue
+        key = question_key(question)
+        if key in seen:
+            continue
+        seen.add(key)
+        selected.append(question)
+        if len(selected) == count:
+            break
+    return selected
+
+class QuestionGenerator:
+    """
+    Generates question records for a text.
+    Texts over the chunk budget are split into sections that are sent to the
+    model concurrently, then the candidates are deduplicated and merged.
+    For each chunk it asks the model for schema-constrained JSON first, falls back to the text
+    parser if the model answered in the "Q1. / A)" layout anyway, and only
+    then pays for a second call with the simplified text prompt.
+    """
+
+    PATHS = ('json', 'text_fallback', 'retry', 'failed')
+
+    def __init__(self, client=None, chunk_tokens=None, max_chunks=None):
+        self._client = client
+        self.chunk_tokens = chunk_tokens or settings.QUIZ_CHUNK_TOKENS
+        self.max_chunks = max_chunks or settings.QUIZ_MAX_CHUNKS
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(self.PATHS, 0)
+
+    def _record(self, path):
+        with self._lock:
+            self._counters[path] += 1
+
+    @property
+    def client(self):
+        return self._client or llm.get_client()
+
+    def generate(self, text, difficulty, variant=0):
+        """`variant` > 0 asks for an alternative question set for the same text"""
+        chunks = spread(split_text(text, self.chunk_tokens), self.max_chunks)
+        if len(chunks) <= 1:
+            return self.generate_chunk(text, difficulty, variant)
+
+        futures = [chunk_executor.submit(self.generate_chunk, chunk, difficulty, variant) for chunk in chunks]
+        candidate_sets = []
+        error = None
+        for future in futures:
+            try:
+                candidate_sets.append(future.result())
+            except llm.LLMError as e:
+                # One failed section shouldn't sink the quiz when the others produced questions
+                print(f"Error generating questions for a text chunk: {str(e)}")
+                error = error or e
+
+        questions = select_questions(candidate_sets)
+        if not questions and error:
+            raise error
+        return questions
+
+    def generate_chunk(self, text, difficulty, variant=0):
+        content = self.client.generate(
+            build_json_prompt(text, difficulty, variant),
+            generation_config=JSON_GENERATION_CONFIG
+        )
+
+        questions = parse_json_questions(content)
+        if questions:
+            self._record('json')
+            return questions
+
+        questions = parse_questions(content)
+        if questions:
+            self._record('text_fallback')
+            return questions
+
+        questions = parse_questions(self.client.generate(build_simplified_prompt(text, variant)))
+        self._record('retry' if questions else 'failed')
+        return questions
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        total = sum(counters.values())
+        return {
+            **counters,
+            'json_rate': counters['json'] / total if total else 0
+        }
+
+question_generator = QuestionGenerator()
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """sha256 of a file, read in chunks so large PDFs are never fully loaded"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_text(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def text_key(pdf_hash):
+    return f"text:{pdf_hash}"
+
+def questions_key(pdf_hash, difficulty, prompt_version):
+    return f"questions:{pdf_hash}:{difficulty}:v{prompt_version}"
+
+def variant_key(text_hash, difficulty, prompt_version, variant):
+    return f"variant:{text_hash}:{difficulty}:v{prompt_version}:{variant}"
+
+class GenerationCache:
+    """
+    Two-tier cache for extracted text and generated question sets.
+    The memory tier is an LRU bounded by entry count and by the serialized
+    size of its values (`max_memory_bytes`); values larger than that budget,
+    such as the text of long PDFs, are only kept on disk. The disk tier stores
+    one JSON file per key. Both tiers expire entries after `ttl` seconds.
+    """
+
+    PRUNE_EVERY = 200  # sets between disk sweeps
+
+    def __init__(self, directory, max_entries=256, max_memory_bytes=64 * 1024 * 1024, max_disk_entries=5000, ttl=30 * 24 * 3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (stored_at, value, size)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, name[:2], f"{name}.json")
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _forget(self, key):
+        # Callers hold the lock
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[2]
+
+    def _remember(self, key, stored_at, value, size):
+        with self._lock:
+            self._forget(key)
+            if size > self.max_memory_bytes:
+                return
+            self._memory[key] = (stored_at, value, size)
+            self._memory_bytes += size
+            while len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+                self._forget(next(iter(self._memory)))
+                self._counters['evictions'] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return entry[1]
+                self._forget(key)
+
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                serialized = f.read()
+            stored = json.loads(serialized)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+        if now - stored['stored_at'] > self.ttl:
+            self._remove_file(path)
+            self._count('misses')
+            return None
+
+        self._remember(key, stored['stored_at'], stored['value'], len(serialized))
+        self._count('disk_hits')
+        return stored['value']
+
+    def contains(self, key):
+        """Whether either tier has a live entry for `key`, without loading it or counting a lookup"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                return True
+        try:
+            return now - os.path.getmtime(self._path(key)) <= self.ttl
+        except OSError:
+            return False
+
+    def set(self, key, value):
+        stored_at = time.time()
+        serialized = json.dumps({'key': key, 'stored_at': stored_at, 'value': value})
+        self._remember(key, stored_at, value, len(serialized))
+        with self._lock:
+            self._counters['sets'] += 1
+            should_prune = self._counters['sets'] % self.PRUNE_EVERY == 0
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(serialized)
+        os.replace(tmp_path, path)
+        if should_prune:
+            self.prune()
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """Drop expired disk entries, then the oldest ones beyond `max_disk_entries`"""
+        if not os.path.isdir(self.directory):
+            return 0
+        now = time.time()
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+
+        entries.sort()
+        expired = [path for mtime, path in entries if now - mtime > self.ttl]
+        live = [path for mtime, path in entries if now - mtime <= self.ttl]
+        overflow = live[:max(0, len(live) - self.max_disk_entries)]
+        for path in expired + overflow:
+            self._remove_file(path)
+        with self._lock:
+            self._counters['evictions'] += len(expired) + len(overflow)
+        return len(expired) + len(overflow)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            memory_entries = len(self._memory)
+            memory_bytes = self._memory_bytes
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        hits = counters['memory_hits'] + counters['disk_hits']
+        return {
+            **counters,
+            'hit_rate': hits / lookups if lookups else 0,
+            'memory_entries': memory_entries,
+            'memory_bytes': memory_bytes
+        }
+
+generation_cache = GenerationCache(
+    settings.QUIZ_CACHE_DIR,
+    max_entries=settings.QUIZ_CACHE_MAX_ENTRIES,
+    max_memory_bytes=settings.QUIZ_CACHE_MAX_MEMORY_BYTES,
+    max_disk_entries=settings.QUIZ_CACHE_MAX_DISK_ENTRIES,
+    ttl=settings.QUIZ_CACHE_TTL
+)
@@ -0,0 +1,120 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from datetime import timedelta
+from django.utils import timezone
+from .models import QuizGenerationJob, Story
+from .question_bank import fill_pool
+from .services import generate_story_quiz
+
+# In-process worker pool shared by every request in this process
+executor = ThreadPoolExecutor(
+    max_workers=settings.QUIZ_GENERATION_WORKERS,
+    thread_name_prefix='quiz-generation'
+)
+
+# Speculative work (question bank fills, regenerate variants) runs on its own
+# smaller pool so it never holds up the generation of an uploaded story
+background_executor = ThreadPoolExecutor(
+    max_workers=settings.QUIZ_BACKGROUND_WORKERS,
+    thread_name_prefix='quiz-background'
+)
+
+# (story id, difficulty) pairs with a question bank fill queued or running
+_pool_fills = set()
+_pool_fills_lock = threading.Lock()
+
+def submit_generation_job(job):
+    """Queue a job once the transaction that created it has committed"""
+    transaction.on_commit(lambda: executor.submit(run_generation_job, job.id))
+
+def run_generation_job(job_id):
+    close_old_connections()
+    try:
+        job = QuizGenerationJob.objects.select_related('story').get(id=job_id)
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+
+        @contextmanager
+        def stage(name):
+            job.stage = name
+            job.save(update_fields=['stage'])
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                job.stage_timings[name] = round((time.perf_counter() - started) * 1000, 1)
+                job.save(update_fields=['stage_timings'])
+
+        try:
+            job.quiz = generate_story_quiz(job.story, stage)
+            job.status = 'succeeded'
+        except Exception as e:
+            print(f"Error generating questions for job {job_id}: {str(e)}")
+            job.status = 'failed'
+            job.error = str(e)
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=['quiz', 'status', 'error', 'finished_at'])
+        if job.status == 'succeeded':
+            submit_pool_fill(job.story)
+    finally:
+        # Worker threads own their connection; don't leak it between jobs
+        connection.close()
+
+def _stale_cutoff(timeout=None):
+    if timeout is None:
+        timeout = settings.QUIZ_GENERATION_JOB_TIMEOUT
+    return timezone.now() - timedelta(seconds=timeout)
+
+def is_stale(job):
+    """Whether the job has been pending or running for longer than QUIZ_GENERATION_JOB_TIMEOUT"""
+    cutoff = _stale_cutoff()
+    return (
+        (job.status == 'pending' and job.created_at < cutoff)
+        or (job.status == 'running' and job.started_at is not None and job.started_at < cutoff)
+    )
+
+def fail_stale_jobs(jobs=None, timeout=None):
+    """
+    Mark jobs that have been pending or running for longer than `timeout`
+    seconds (default QUIZ_GENERATION_JOB_TIMEOUT) as failed. The executor lives in the web
+    process, so a restart drops its queue and whatever it was running; those
+    jobs would otherwise stay pending or running forever. Returns the number
+    of jobs failed.
+    """
+    jobs = QuizGenerationJob.objects.all() if jobs is None else jobs
+    cutoff = _stale_cutoff(timeout)
+    return jobs.filter(
+        Q(status='pending', created_at__lt=cutoff) | Q(status='running', started_at__lt=cutoff)
+    ).update(
+        status='failed',
+        error='Generation was interrupted (the server restarted or the job timed out); please upload the story again',
+        finished_at=timezone.now()
+    )
+
+def submit_pool_fill(story):
+    """Queue a question bank top-up for the story unless one is already pending"""
+    key = (story.id, story.difficulty)
+    with _pool_fills_lock:
+        if key in _pool_fills:
+            return
+        _pool_fills.add(key)
+    background_executor.submit(run_pool_fill, *key)
+
+def run_pool_fill(story_id, difficulty):
+    close_old_connections()
+    try:
+        story = Story.objects.get(id=story_id)
+        fill_pool(story, difficulty)
+    except Exception as e:
+        print(f"Error filling the question bank of story {story_id}: {str(e)}")
+    finally:
+        with _pool_fills_lock:
+            _pool_fills.discard((story_id, difficulty))
+        connection.close()
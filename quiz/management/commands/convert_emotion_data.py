@@ -0,0 +1,81 @@
+import json
+import os
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from quiz.emotion_inference import EMOTION_LABELS
+from quiz.emotion_sessions import timestamp_ms
+from quiz.emotion_storage import OVERALL, write_emotion_file
+from quiz.models import QuizAttempt
+
+class Command(BaseCommand):
+    help = "Convert the JSON emotion data files of quiz attempts to the binary emotion data format"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', action='store_true', help="Keep the JSON files after converting them")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        attempts = QuizAttempt.objects.filter(emotion_data_file__endswith='.json').only('id', 'emotion_data_file').order_by('id')
+
+        converted = []  # (attempt, JSON path) pairs not yet saved
+        count = bytes_before = bytes_after = 0
+        for attempt in attempts.iterator(chunk_size=options['batch_size']):
+            # Older attempts stored the absolute path of their file
+            json_path = os.path.join(settings.MEDIA_ROOT, attempt.emotion_data_file.name)
+            try:
+                with open(json_path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"Attempt {attempt.id}: could not read {json_path}: {str(e)}")
+                continue
+
+            try:
+                segments, frames = self.convert(data)
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                self.stderr.write(f"Attempt {attempt.id}: could not convert {json_path}: {e!r}")
+                continue
+
+            name = f'emotion_data/emotion_data_{attempt.id}.emo'
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_emotion_file(path, segments, frames)
+            bytes_before += os.path.getsize(json_path)
+            bytes_after += os.path.getsize(path)
+
+            attempt.emotion_data_file = name
+            converted.append((attempt, json_path))
+            count += 1
+            if len(converted) >= options['batch_size']:
+                self.save(converted, options)
+                converted = []
+
+        self.save(converted, options)
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted the emotion data of {count} attempts ({bytes_before} bytes of JSON to {bytes_after})"
+        ))
+
+    def convert(self, data):
+        """Segment and frame records of the binary format from the contents of a JSON file"""
+        history = data.get('emotion_history', [])
+        frames = [
+            (timestamp_ms(entry.get('timestamp')), OVERALL, [entry['emotions'].get(label, 0.0) for label in EMOTION_LABELS])
+            for entry in history
+        ]
+        if frames:
+            emotions = np.array([frame[2] for frame in frames], dtype=np.float64)
+            overall = (OVERALL, len(frames), emotions.mean(axis=0), emotions.std(axis=0))
+        else:
+            average = data.get('average_emotions', {})
+            overall = (
+                OVERALL, data.get('total_frames_analyzed', 0),
+                [average.get(label, 0.0) for label in EMOTION_LABELS], [0.0] * len(EMOTION_LABELS)
+            )
+        return [overall], frames
+
+    def save(self, converted, options):
+        """Point the attempts at their binary files, and only then remove the JSON ones"""
+        QuizAttempt.objects.bulk_update([attempt for attempt, _ in converted], ['emotion_data_file'])
+        if not options['keep']:
+            for _, json_path in converted:
+                os.remove(json_path)
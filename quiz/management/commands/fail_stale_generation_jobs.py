@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from quiz.jobs import fail_stale_jobs
+
+class Command(BaseCommand):
+    help = "Mark quiz generation jobs lost to a restart (pending or running past QUIZ_GENERATION_JOB_TIMEOUT) as failed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Fail every pending or running job, whatever its age (only while no web process is running jobs)"
+        )
+
+    def handle(self, *args, **options):
+        failed = fail_stale_jobs(timeout=0 if options['all'] else None)
+        self.stdout.write(self.style.SUCCESS(f"Marked {failed} generation jobs as failed"))
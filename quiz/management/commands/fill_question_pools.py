@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from quiz.models import Story
+from quiz.question_bank import fill_pool
+
+class Command(BaseCommand):
+    help = "Pre-generate question banks so new quizzes are sampled instead of generated on request"
+
+    def add_arguments(self, parser):
+        parser.add_argument('story_ids', nargs='*', type=int, help="Stories to fill (default: all)")
+        parser.add_argument('--target', type=int, help="Questions per story (default: QUESTION_POOL_TARGET)")
+
+    def handle(self, *args, **options):
+        stories = Story.objects.exclude(generated_story='').order_by('id')
+        if options['story_ids']:
+            stories = stories.filter(id__in=options['story_ids'])
+
+        total = 0
+        for story in stories.iterator():
+            try:
+                added = fill_pool(story, target=options['target'])
+            except Exception as e:
+                self.stderr.write(f"Story {story.id}: {str(e)}")
+                continue
+            total += added
+            self.stdout.write(f"Story {story.id}: added {added} questions")
+        self.stdout.write(self.style.SUCCESS(f"Added {total} questions"))
@@ -0,0 +1,74 @@
+import json
+import os
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from quiz.models import Story
+from quiz.parsing import OPTION_FIELDS
+from quiz.persistence import import_story
+
+QUESTION_FIELDS = {'question_text', 'correct_answer', *OPTION_FIELDS.values()}
+
+class Command(BaseCommand):
+    help = (
+        "Import a story with a ready-made quiz from a JSON file: "
+        '{"title", "pdf_file", "difficulty", "text", "questions": [{"question_text", "option_a".."option_d", "correct_answer"}]}, '
+        "where pdf_file is the path of the story PDF, relative to the JSON file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Email of the user who will own the story")
+        parser.add_argument('path', help="Path to the JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        try:
+            with open(options['path']) as f:
+                data = json.load(f)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e.strerror}")
+        except ValueError as e:
+            raise CommandError(f"{options['path']} is not valid JSON: {str(e)}")
+        if not isinstance(data, dict):
+            raise CommandError("The JSON file must contain an object")
+
+        missing = {'title', 'pdf_file'} - data.keys()
+        if missing:
+            raise CommandError(f"The JSON file is missing {', '.join(sorted(missing))}")
+        pdf_path = os.path.join(os.path.dirname(os.path.abspath(options['path'])), data['pdf_file'])
+        if not os.path.isfile(pdf_path):
+            raise CommandError(f"PDF file not found: {pdf_path}")
+
+        difficulty = data.get('difficulty', 'medium')
+        if difficulty not in dict(Story.DIFFICULTY_CHOICES):
+            raise CommandError(f"Unknown difficulty: {difficulty}")
+
+        questions = []
+        for index, question in enumerate(data.get('questions', []), start=1):
+            if not isinstance(question, dict):
+                raise CommandError(f"Question {index} must be an object")
+            missing = QUESTION_FIELDS - question.keys()
+            if missing:
+                raise CommandError(f"Question {index} is missing {', '.join(sorted(missing))}")
+            if question['correct_answer'] not in ['A', 'B', 'C', 'D']:
+                raise CommandError(f"Question {index} has an invalid correct_answer")
+            questions.append({field: question[field] for field in QUESTION_FIELDS})
+
+        # The PDF is copied into media storage like an uploaded one
+        with open(pdf_path, 'rb') as f:
+            story, quiz, created = import_story(
+                user=user,
+                title=data['title'],
+                pdf_file=File(f, name=os.path.basename(pdf_path)),
+                generated_story=data.get('text', ''),
+                difficulty=difficulty,
+                quiz_title=data.get('quiz_title', f"Quiz for {data['title']} ({difficulty.capitalize()})"),
+                questions=questions
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported story {story.id} with quiz {quiz.id} ({len(created)} questions)"
+        ))
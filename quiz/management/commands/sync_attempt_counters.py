@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+from quiz.models import Question, QuizAttempt
+
+COUNTER_FIELDS = ('total_questions', 'answered_count', 'correct_count')
+
+class Command(BaseCommand):
+    help = "Backfill the answer counters on quiz attempts from the Answer and Question tables, or verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report attempts whose counters are wrong")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        question_counts = dict(
+            Question.objects.order_by().values('quiz').annotate(total=Count('id')).values_list('quiz', 'total')
+        )
+        attempts = QuizAttempt.objects.annotate(
+            answers_total=Count('answers'),
+            answers_correct=Count('answers', filter=Q(answers__is_correct=True))
+        ).order_by('id')
+
+        stale = []
+        checked = 0
+        for attempt in attempts.iterator(chunk_size=options['batch_size']):
+            checked += 1
+            expected = (question_counts.get(attempt.quiz_id, 0), attempt.answers_total, attempt.answers_correct)
+            if tuple(getattr(attempt, field) for field in COUNTER_FIELDS) == expected:
+                continue
+            if options['check']:
+                self.stdout.write(
+                    f"Attempt {attempt.id}: " +
+                    ', '.join(f"{field} {getattr(attempt, field)} != {value}" for field, value in zip(COUNTER_FIELDS, expected))
+                )
+            attempt.total_questions, attempt.answered_count, attempt.correct_count = expected
+            stale.append(attempt)
+
+        if options['check']:
+            if stale:
+                raise CommandError(f"{len(stale)} of {checked} attempts have wrong counters")
+            self.stdout.write(self.style.SUCCESS(f"All {checked} attempts have correct counters"))
+            return
+
+        QuizAttempt.objects.bulk_update(stale, COUNTER_FIELDS, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Fixed the counters of {len(stale)} of {checked} attempts"))
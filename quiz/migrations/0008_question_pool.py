@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_quizgenerationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], max_length=10)),
+                ('question_text', models.TextField()),
+                ('option_a', models.CharField(max_length=500)),
+                ('option_b', models.CharField(max_length=500)),
+                ('option_c', models.CharField(max_length=500)),
+                ('option_d', models.CharField(max_length=500)),
+                ('correct_answer', models.CharField(max_length=1)),
+                ('prompt_version', models.PositiveIntegerField()),
+                ('times_used', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_pool', to='quiz.story')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['story', 'difficulty', 'prompt_version', 'times_used', 'id'], name='quiz_pool_sample_idx')],
+            },
+        ),
+    ]
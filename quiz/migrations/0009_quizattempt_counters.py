@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:18
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+def count_answers(apps, schema_editor):
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+
+    attempts = QuizAttempt.objects.annotate(
+        answers_total=Count('answers'),
+        answers_correct=Count('answers', filter=Q(answers__is_correct=True))
+    )
+    for attempt in attempts:
+        attempt.answered_count = attempt.answers_total
+        attempt.correct_count = attempt.answers_correct
+        attempt.save(update_fields=['answered_count', 'correct_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_question_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_answers, migrations.RunPython.noop),
+    ]
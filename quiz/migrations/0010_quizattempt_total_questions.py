@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+def count_questions(apps, schema_editor):
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    Question = apps.get_model('quiz', 'Question')
+
+    question_counts = (
+        Question.objects.filter(quiz=OuterRef('quiz'))
+        .order_by()
+        .values('quiz')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    QuizAttempt.objects.update(total_questions=Coalesce(Subquery(question_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_quizattempt_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='total_questions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_questions, migrations.RunPython.noop),
+    ]
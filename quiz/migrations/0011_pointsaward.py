@@ -0,0 +1,44 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+DIFFICULTY_POINTS = {'easy': 10, 'medium': 20, 'hard': 30}
+
+def record_existing_awards(apps, schema_editor):
+    """Attempts completed before the ledger already had their points credited"""
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    PointsAward = apps.get_model('quiz', 'PointsAward')
+
+    attempts = QuizAttempt.objects.filter(completed=True).select_related('quiz__story')
+    PointsAward.objects.bulk_create([
+        PointsAward(
+            user_id=attempt.user_id,
+            attempt=attempt,
+            points=int(DIFFICULTY_POINTS.get(attempt.quiz.story.difficulty, 10) * (attempt.score or 0) / 100)
+        )
+        for attempt in attempts.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_quizattempt_total_questions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsAward',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempt', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='points_award', to='quiz.quizattempt')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_awards', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(record_existing_awards, migrations.RunPython.noop),
+    ]
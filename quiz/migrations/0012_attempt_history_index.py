@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_pointsaward'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'completed', '-completed_at', '-id'], name='attempt_history_idx'),
+        ),
+    ]
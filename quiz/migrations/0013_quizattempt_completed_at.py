@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-17 17:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+def backfill_completed_at(apps, schema_editor):
+    """Completed attempts without a timestamp finished when their last answer landed"""
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    Answer = apps.get_model('quiz', 'Answer')
+
+    last_answer = (
+        Answer.objects.filter(attempt=OuterRef('pk'))
+        .order_by()
+        .values('attempt')
+        .annotate(last=Max('answered_at'))
+        .values('last')
+    )
+    QuizAttempt.objects.filter(completed=True, completed_at__isnull=True).update(
+        completed_at=Coalesce(Subquery(last_answer), F('started_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_attempt_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quizattempt',
+            constraint=models.CheckConstraint(check=models.Q(('completed', False), ('completed_at__isnull', False), _connector='OR'), name='attempt_completed_at_set'),
+        ),
+    ]
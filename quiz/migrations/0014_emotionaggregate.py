@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-17 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_quizattempt_completed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmotionAggregate',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='emotion_aggregate', serialize=False, to='quiz.quizattempt')),
+                ('state', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+from django.utils import timezone
 from django.contrib.auth.models import User
-from accounts.models import Profile
+from accounts.leaderboard import leaderboard
+from accounts.models import DailyPoints, Profile
 
 class Story(models.Model):
     DIFFICULTY_CHOICES = [
@@ -41,6 +43,55 @@ class Question(models.Model):
     def __str__(self):
         return self.question_text
 
+class PooledQuestion(models.Model):
+    """A pre-generated question in a story's question bank; quizzes are assembled by sampling these"""
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='question_pool')
+    difficulty = models.CharField(max_length=10, choices=Story.DIFFICULTY_CHOICES)
+    question_text = models.TextField()
+    option_a = models.CharField(max_length=500)
+    option_b = models.CharField(max_length=500)
+    option_c = models.CharField(max_length=500)
+    option_d = models.CharField(max_length=500)
+    correct_answer = models.CharField(max_length=1)  # A, B, C, or D
+    prompt_version = models.PositiveIntegerField()
+    times_used = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Sampling reads the least used current questions of one pool
+            models.Index(
+                fields=['story', 'difficulty', 'prompt_version', 'times_used', 'id'],
+                name='quiz_pool_sample_idx'
+            )
+        ]
+
+    def __str__(self):
+        return self.question_text
+
+class QuizGenerationJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed')
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='generation_jobs')
+    quiz = models.ForeignKey(Quiz, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    stage = models.CharField(max_length=20, blank=True)
+    stage_timings = models.JSONField(default=dict)  # stage name -> milliseconds
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Generation job {self.id} for {self.story.title} ({self.status})"
+
 class QuizAttempt(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
@@ -48,21 +99,33 @@ class QuizAttempt(models.Model):
     emotions_log = models.JSONField(default=dict)
     emotion_data_file = models.FileField(upload_to='emotion_data/', null=True, blank=True)
     completed = models.BooleanField(default=False)
+    # Maintained as answers land (see quiz/submissions.py); `sync_attempt_counters` repairs them
+    total_questions = models.PositiveIntegerField(default=0)
+    answered_count = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ['user', 'quiz']
+        indexes = [
+            # History pages: a user's completed attempts, newest first (id breaks completion time ties)
+            models.Index(fields=['user', 'completed', '-completed_at', '-id'], name='attempt_history_idx')
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(completed=False) | models.Q(completed_at__isnull=False),
+                name='attempt_completed_at_set'
+            )
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s attempt on {self.quiz.title}"
 
     def calculate_score(self):
-        total_questions = self.quiz.questions.count()
-        if total_questions == 0:
+        if self.total_questions == 0:
             return 0
-        correct_answers = self.answers.filter(is_correct=True).count()
-        return (correct_answers / total_questions) * 100
+        return (self.correct_count / self.total_questions) * 100
 
     def calculate_points(self):
         difficulty_points = {
@@ -75,21 +138,65 @@ class QuizAttempt(models.Model):
         return int(max_points * score_percentage)
 
     def award_points(self):
-        if not self.completed or hasattr(self, '_points_awarded'):
-            return
-        
+        """
+        Credit the attempt's points to the user's profile, at most once.
+        The ledger row is unique per attempt, so when several workers race to
+        award the same attempt only the one whose insert succeeds updates the
+        profile. Returns whether points were awarded.
+        """
+        if not self.completed:
+            return False
+
         points_earned = self.calculate_points()
-        profile = self.user.profile
-        profile.add_points(points_earned)
-        profile.update_streak()
-        self._points_awarded = True
+        with transaction.atomic(savepoint=False):
+            try:
+                with transaction.atomic():
+                    PointsAward.objects.create(user_id=self.user_id, attempt=self, points=points_earned)
+            except IntegrityError:
+                return False
+            Profile.record_quiz(self.user_id, points_earned)
+            DailyPoints.record(self.user_id, points_earned)
+            transaction.on_commit(leaderboard.invalidate)
+        return True
 
     def save(self, *args, **kwargs):
         is_new = self._state.adding
+        if is_new and not self.total_questions:
+            self.total_questions = Question.objects.filter(quiz_id=self.quiz_id).count()
+        update_fields = kwargs.get('update_fields')
+        if self.completed and self.completed_at is None:
+            # Stamp completion however the attempt got completed (submissions, admin, shell)
+            self.completed_at = timezone.now()
+            if update_fields is not None and 'completed_at' not in update_fields:
+                kwargs['update_fields'] = update_fields = [*update_fields, 'completed_at']
         super().save(*args, **kwargs)
-        if not is_new and self.completed:
+        if not is_new and self.completed and (update_fields is None or 'completed' in update_fields):
             self.award_points()
 
+class PointsAward(models.Model):
+    """Append-only ledger of the points credited for each completed attempt"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='points_awards')
+    # Kept when the attempt is deleted: the points stay in the profile total
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.SET_NULL, null=True, related_name='points_award')
+    points = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.points} points for attempt {self.attempt_id}"
+
+class EmotionAggregate(models.Model):
+    """
+    Running emotion statistics and frame sample of an attempt in progress
+    (see quiz/emotion_sessions.py), shared by every web process; removed
+    once they are written to the attempt's emotion data file
+    """
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.CASCADE, primary_key=True, related_name='emotion_aggregate')
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Emotion statistics of attempt {self.attempt_id}"
+
 class Answer(models.Model):
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
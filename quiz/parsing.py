@@ -0,0 +1,84 @@
+import re
+
+# Markdown emphasis, headings and bullets the model likes to wrap lines in
+DECORATION_RE = re.compile(r'\*\*|__|^\s*(?:#{1,6}|[-*•])\s+')
+
+# The number's separator must be followed by whitespace, so "3.5 metres" or "2-3 trees" isn't a question
+QUESTION_RE = re.compile(
+    r'^(Q(?:uestion)?\s*)?(\d+)\s*[.):\-](?=\s|$)\s*(.*)$',
+    re.IGNORECASE
+)
+OPTION_RE = re.compile(r'^\(?([A-D])\s*[).:\-]\s*(.+)$', re.IGNORECASE)
+# The letter must end the line or be followed by ")", "." or ":", so prose such as "answer a bit" isn't a key
+ANSWER_RE = re.compile(
+    r'^(?:correct\s+)?ans(?:wer)?\s*(?:is)?\s*[:\-–=]?\s*\(?([A-D])\s*(?:[).:]|$)',
+    re.IGNORECASE
+)
+
+OPTION_FIELDS = {'A': 'option_a', 'B': 'option_b', 'C': 'option_c', 'D': 'option_d'}
+
+def _clean(line):
+    return DECORATION_RE.sub('', line).strip()
+
+def _build(question_lines, options, answer):
+    question_text = ' '.join(question_lines).strip()
+    if not question_text or len(options) != 4:
+        return None
+    question = {'question_text': question_text}
+    for letter, field in OPTION_FIELDS.items():
+        question[field] = ' '.join(options[letter]).strip()
+    question['correct_answer'] = answer
+    return question
+
+def parse_questions(generated_content):
+    """
+    Parse LLM output in the "Q1. / A) / Answer:" layout into question dicts.
+
+    Runs a single pass over the lines with a small state machine, so numbering
+    variants ("1.", "Q1)", "Question 1:"), option styles ("A)", "(a)", "A.") and
+    answer styles ("Answer: B", "Answer - B", "**Correct answer:** B)") are all
+    accepted. Incomplete questions are dropped instead of aborting the parse.
+    """
+    parsed = []
+    question_lines = None  # None while we are outside a question
+    options = {}
+    current_option = None
+
+    for raw_line in generated_content.splitlines():
+        line = _clean(raw_line)
+        if not line:
+            continue
+
+        match = ANSWER_RE.match(line)
+        if match:
+            if question_lines is not None:
+                question = _build(question_lines, options, match.group(1).upper())
+                if question:
+                    parsed.append(question)
+            question_lines, options, current_option = None, {}, None
+            continue
+
+        # Option letters are only meaningful once a question has started
+        if question_lines is not None:
+            match = OPTION_RE.match(line)
+            if match:
+                letter = match.group(1).upper()
+                if letter not in options:
+                    current_option = letter
+                    options[letter] = [match.group(2)]
+                    continue
+
+        # A bare "2." inside an unfinished question is more likely wrapped text
+        # (e.g. "2-3 trees") than a new question; an explicit "Q2." always wins
+        match = QUESTION_RE.match(line)
+        if match and (match.group(1) or question_lines is None or len(options) == 4):
+            question_lines, options, current_option = [match.group(3)], {}, None
+            continue
+
+        # Continuation of a wrapped question or option
+        if current_option is not None:
+            options[current_option].append(line)
+        elif question_lines is not None:
+            question_lines.append(line)
+
+    return parsed
@@ -0,0 +1,92 @@
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import PyPDF2
+from django.conf import settings
+
+_process_pool = None
+
+class PDFTooLargeError(ValueError):
+    pass
+
+def get_process_pool():
+    """Lazily start the extraction process pool (spawned, so it is safe from worker threads)"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_EXTRACTION_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _process_pool
+
+@contextmanager
+def _map_pdf(path):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PyPDF2.PdfReader(mapped)
+
+@contextmanager
+def open_pdf(path):
+    """Memory-map a PDF on disk so pages are read lazily instead of loading the whole upload"""
+    size = os.path.getsize(path)
+    if size > settings.PDF_MAX_BYTES:
+        raise PDFTooLargeError(f"PDF is {size} bytes, the limit is {settings.PDF_MAX_BYTES}")
+    if size == 0:
+        raise PyPDF2.errors.EmptyFileError("Cannot read an empty file")
+    with _map_pdf(path) as reader:
+        yield reader
+
+def _extract_page_range(path, start, stop):
+    """Process pool task: extract the text of pages [start, stop)"""
+    with _map_pdf(path) as reader:
+        return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+def _page_count(reader, max_pages):
+    page_count = len(reader.pages)
+    if page_count > max_pages:
+        raise PDFTooLargeError(f"PDF has {page_count} pages, the limit is {max_pages}")
+    return page_count
+
+def iter_page_texts(path, max_pages=None):
+    """
+    Yield the text of each page in order.
+    Large documents are split into page ranges that are extracted in parallel
+    across the process pool; pages are still yielded as soon as their range is done.
+    """
+    max_pages = max_pages or settings.PDF_MAX_PAGES
+    with open_pdf(path) as reader:
+        page_count = _page_count(reader, max_pages)
+        if page_count < settings.PDF_PARALLEL_PAGE_THRESHOLD:
+            for page in reader.pages:
+                yield page.extract_text() or ''
+            return
+
+    step = settings.PDF_PAGES_PER_TASK
+    pool = get_process_pool()
+    futures = [
+        pool.submit(_extract_page_range, path, start, min(start + step, page_count))
+        for start in range(0, page_count, step)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Consumers may stop early (e.g. once the text cap is reached)
+        for future in futures:
+            future.cancel()
+
+def iter_text(path, max_pages=None, max_chars=None):
+    """Yield page texts until the character budget is used up"""
+    remaining = max_chars or settings.PDF_MAX_TEXT_CHARS
+    for text in iter_page_texts(path, max_pages=max_pages):
+        if len(text) >= remaining:
+            yield text[:remaining]
+            return
+        remaining -= len(text)
+        yield text
+
+def extract_text(path, max_pages=None, max_chars=None):
+    """Extract the whole document, joining the page texts once"""
+    return '\n'.join(iter_text(path, max_pages=max_pages, max_chars=max_chars))
@@ -0,0 +1,49 @@
+from django.db import transaction
+from .models import Story, Quiz, Question
+
+def question_payload(question):
+    """Question data as returned to the client (no correct answer)"""
+    return {
+        'id': question.id,
+        'text': question.question_text,
+        'options': [
+            f"A) {question.option_a}",
+            f"B) {question.option_b}",
+            f"C) {question.option_c}",
+            f"D) {question.option_d}"
+        ]
+    }
+
+def create_quiz(story, title, questions):
+    """
+    Create a quiz and all of its questions in one transaction.
+    `questions` are dicts with question_text, option_a-d and correct_answer,
+    as produced by the parser. Returns the quiz and the created questions,
+    which have their ids set.
+    """
+    with transaction.atomic():
+        quiz = Quiz.objects.create(story=story, title=title)
+        created = Question.objects.bulk_create([
+            Question(quiz=quiz, **question) for question in questions
+        ])
+    return quiz, created
+
+def save_story_quiz(story, generated_story, title, questions):
+    """Store the extracted text of an existing story together with its first quiz"""
+    with transaction.atomic():
+        story.generated_story = generated_story
+        story.save(update_fields=['generated_story'])
+        return create_quiz(story, title, questions)
+
+def import_story(user, title, pdf_file, generated_story, difficulty, quiz_title, questions):
+    """Create a story, its quiz and questions in one go, e.g. from an admin import"""
+    with transaction.atomic():
+        story = Story.objects.create(
+            user=user,
+            title=title,
+            pdf_file=pdf_file,
+            generated_story=generated_story,
+            difficulty=difficulty
+        )
+        quiz, created = create_quiz(story, quiz_title, questions)
+    return story, quiz, created
@@ -0,0 +1,128 @@
+import random
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+from .generation import PROMPT_VERSION, QUESTIONS_PER_QUIZ, question_generator, question_key
+from .generation_cache import generation_cache, hash_text, variant_key
+from .models import PooledQuestion
+from .parsing import OPTION_FIELDS
+from .persistence import create_quiz
+
+QUESTION_FIELDS = ('question_text', *OPTION_FIELDS.values(), 'correct_answer')
+
+# Quizzes are sampled from this many times `count` of the least used questions
+SAMPLE_WINDOW = 3
+
+def current_pool(story, difficulty=None):
+    return PooledQuestion.objects.filter(
+        story=story,
+        difficulty=difficulty or story.difficulty,
+        prompt_version=PROMPT_VERSION
+    )
+
+def _variant_questions(text, text_hash, difficulty, variant):
+    # Shares memoized variants with the regenerate pool
+    key = variant_key(text_hash, difficulty, PROMPT_VERSION, variant)
+    questions = generation_cache.get(key)
+    if questions is None:
+        questions = question_generator.generate(text, difficulty, variant)
+        if questions:
+            generation_cache.set(key, questions)
+    return questions
+
+def fill_pool(story, difficulty=None, target=None):
+    """
+    Top up a story's question bank to `target` distinct questions.
+    Generates alternative question sets one variant at a time and stores the
+    questions whose wording isn't in the pool yet. Returns how many were added.
+    """
+    difficulty = difficulty or story.difficulty
+    target = target or settings.QUESTION_POOL_TARGET
+    text = story.generated_story
+    if not text:
+        return 0
+
+    seen = {
+        question_key({'question_text': question_text})
+        for question_text in current_pool(story, difficulty).values_list('question_text', flat=True)
+    }
+    text_hash = hash_text(text)
+    max_variants = 2 * -(-target // QUESTIONS_PER_QUIZ)
+    added = []
+    for variant in range(max_variants):
+        if len(seen) >= target:
+            break
+        for question in _variant_questions(text, text_hash, difficulty, variant):
+            key = question_key(question)
+            if key in seen:
+                continue
+            seen.add(key)
+            added.append(PooledQuestion(
+                story=story,
+                difficulty=difficulty,
+                prompt_version=PROMPT_VERSION,
+                **{field: question[field] for field in QUESTION_FIELDS}
+            ))
+
+    PooledQuestion.objects.bulk_create(added)
+    return len(added)
+
+def assemble_quiz(story, title, count=QUESTIONS_PER_QUIZ):
+    """
+    Create a quiz from the story's question bank without calling the model.
+    Takes the `count` least used questions, picking at random among equally
+    used ones, and marks them used.
+    Returns (quiz, questions), or None when the pool is too small.
+    """
+    window = list(
+        current_pool(story)
+        .order_by('times_used', 'id')
+        .values('id', 'times_used', *QUESTION_FIELDS)[:count * SAMPLE_WINDOW]
+    )
+    if len(window) < count:
+        return None
+
+    picked = sorted(window, key=lambda question: (question['times_used'], random.random()))[:count]
+    with transaction.atomic():
+        quiz, questions = create_quiz(
+            story,
+            title,
+            [{field: question[field] for field in QUESTION_FIELDS} for question in picked]
+        )
+        PooledQuestion.objects.filter(id__in=[question['id'] for question in picked]).update(
+            times_used=F('times_used') + 1,
+            last_used_at=timezone.now()
+        )
+    return quiz, questions
+
+def pool_stats():
+    """Size, freshness and reuse of the question banks"""
+    current = PooledQuestion.objects.filter(prompt_version=PROMPT_VERSION)
+    totals = current.aggregate(
+        questions=Count('id'),
+        used=Count('id', filter=Q(times_used__gt=0)),
+        served=Sum('times_used'),
+        oldest=Min('created_at'),
+        newest=Max('created_at'),
+        last_used=Max('last_used_at')
+    )
+    pools = current.values('story', 'difficulty').distinct().count()
+    served = totals['served'] or 0
+    now = timezone.now()
+
+    def age(moment):
+        return round((now - moment).total_seconds()) if moment else None
+
+    return {
+        'pools': pools,
+        'questions': totals['questions'],
+        'average_pool_size': totals['questions'] / pools if pools else 0,
+        'stale_questions': PooledQuestion.objects.exclude(prompt_version=PROMPT_VERSION).count(),
+        'oldest_question_age': age(totals['oldest']),
+        'newest_question_age': age(totals['newest']),
+        'last_used_age': age(totals['last_used']),
+        'questions_served': served,
+        # Share of served questions that had already appeared in an earlier quiz
+        'reuse_rate': (served - totals['used']) / served if served else 0
+    }
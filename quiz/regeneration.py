@@ -0,0 +1,91 @@
+import threading
+from django.conf import settings
+from .generation import PROMPT_VERSION, question_generator
+from .generation_cache import generation_cache, hash_text, variant_key
+from .jobs import background_executor
+
+class RegenerationPool:
+    """
+    Alternative question sets for regenerating a story's quiz.
+    Sets are memoized in the generation cache by text hash, difficulty and
+    variant number; the n-th quiz of a story uses variant n. After serving a
+    variant, the next `size` variants are generated in the background so the
+    following regenerates are answered from the cache.
+    """
+
+    def __init__(self, cache, generator, size, submit=None):
+        self.cache = cache
+        self.generator = generator
+        self.size = size
+        self._submit = submit
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._counters = {'hits': 0, 'misses': 0, 'refills': 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _generate(self, text, difficulty, variant, key):
+        questions = self.generator.generate(text, difficulty, variant)
+        if questions:
+            self.cache.set(key, questions)
+        return questions
+
+    def questions(self, text, difficulty, variant):
+        """Question records for one variant, generated now if the pool doesn't have it yet"""
+        text_hash = hash_text(text)
+        key = variant_key(text_hash, difficulty, PROMPT_VERSION, variant)
+        questions = self.cache.get(key)
+        if questions is not None:
+            self._count('hits')
+        else:
+            self._count('misses')
+            questions = self._generate(text, difficulty, variant, key)
+
+        self.refill(text, difficulty, variant + 1, text_hash)
+        return questions
+
+    def refill(self, text, difficulty, start, text_hash=None):
+        """Queue the `size` variants from `start` on that aren't cached or already being generated"""
+        if self._submit is None:
+            return
+        text_hash = text_hash or hash_text(text)
+        for variant in range(start, start + self.size):
+            key = variant_key(text_hash, difficulty, PROMPT_VERSION, variant)
+            # Probe without counting a lookup, so refills don't skew the cache hit rate
+            if self.cache.contains(key):
+                continue
+            with self._lock:
+                if key in self._in_flight:
+                    continue
+                self._in_flight.add(key)
+                self._counters['refills'] += 1
+            self._submit(self._refill_one, text, difficulty, variant, key)
+
+    def _refill_one(self, text, difficulty, variant, key):
+        try:
+            self._generate(text, difficulty, variant, key)
+        except Exception as e:
+            print(f"Error pre-generating quiz variant {variant}: {str(e)}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            in_flight = len(self._in_flight)
+        served = counters['hits'] + counters['misses']
+        return {
+            **counters,
+            'hit_rate': counters['hits'] / served if served else 0,
+            'in_flight': in_flight
+        }
+
+regeneration_pool = RegenerationPool(
+    generation_cache,
+    question_generator,
+    size=settings.QUIZ_REGENERATE_POOL_SIZE,
+    submit=background_executor.submit
+)
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Story, Quiz, Question, QuizAttempt, Answer
+from django.conf import settings
+from django.db.models import Count, Prefetch
+from .models import Story, Quiz, Question, QuizAttempt, Answer, QuizGenerationJob
 
 class QuestionSerializer(serializers.ModelSerializer):
     options = serializers.SerializerMethodField()
@@ -29,6 +31,9 @@ class QuizSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at',)
 
     def get_questions_count(self, obj):
+        # Annotated by querysets prepared with QuizAttemptSerializer.setup_eager_loading
+        if hasattr(obj, 'questions_total'):
+            return obj.questions_total
         return obj.questions.count()
 
 class StorySerializer(serializers.ModelSerializer):
@@ -39,6 +44,13 @@ class StorySerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'title', 'pdf_file', 'generated_story', 'difficulty', 'created_at', 'quizzes')
         read_only_fields = ('user', 'generated_story', 'created_at')
 
+    def validate_pdf_file(self, value):
+        if value.size > settings.PDF_MAX_BYTES:
+            raise serializers.ValidationError(
+                f"PDF files are limited to {settings.PDF_MAX_BYTES // (1024 * 1024)} MB."
+            )
+        return value
+
 class AnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Answer
@@ -54,4 +66,34 @@ class QuizAttemptSerializer(serializers.ModelSerializer):
         model = QuizAttempt
         fields = ('id', 'user', 'quiz', 'quiz_details', 'score', 'emotions_log', 
                  'emotion_data_file', 'completed', 'started_at', 'completed_at', 'answers')
-        read_only_fields = ('user', 'score', 'completed', 'started_at', 'completed_at') 
\ No newline at end of file
+        read_only_fields = ('user', 'score', 'completed', 'started_at', 'completed_at')
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the quizzes, their questions and the answers of a page of attempts in a fixed number of queries"""
+        return queryset.prefetch_related(
+            Prefetch('quiz', queryset=Quiz.objects.annotate(questions_total=Count('questions'))),
+            'quiz__questions',
+            'answers'
+        )
+
+
+class QuizAttemptSummarySerializer(serializers.ModelSerializer):
+    """Attempt without the embedded quiz and answers, for history lists"""
+    quiz_title = serializers.CharField(source='quiz.title', read_only=True)
+    difficulty = serializers.CharField(source='quiz.story.difficulty', read_only=True)
+
+    class Meta:
+        model = QuizAttempt
+        fields = ('id', 'quiz', 'quiz_title', 'difficulty', 'score', 'correct_count',
+                 'total_questions', 'completed', 'started_at', 'completed_at')
+        read_only_fields = fields
+
+class QuizGenerationJobSerializer(serializers.ModelSerializer):
+    quiz_details = QuizSerializer(source='quiz', read_only=True)
+
+    class Meta:
+        model = QuizGenerationJob
+        fields = ('id', 'story', 'quiz', 'quiz_details', 'status', 'stage', 'stage_timings',
+                 'error', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
@@ -0,0 +1,38 @@
+from .pdf_extraction import extract_text
+from .persistence import save_story_quiz
+from .generation import PROMPT_VERSION, question_generator
+from .generation_cache import generation_cache, hash_file, text_key, questions_key
+
+def generate_story_quiz(story, stage):
+    """
+    Run the full generation pipeline for a saved story.
+    `stage` is a context manager factory used to time each step.
+    """
+    pdf_hash = hash_file(story.pdf_file.path)
+
+    with stage('extract'):
+        pdf_text = generation_cache.get(text_key(pdf_hash))
+        if pdf_text is None:
+            pdf_text = extract_text(story.pdf_file.path)
+            generation_cache.set(text_key(pdf_hash), pdf_text)
+
+    # Repeated uploads of the same PDF skip generation entirely
+    cache_key = questions_key(pdf_hash, story.difficulty, PROMPT_VERSION)
+    parsed_questions = generation_cache.get(cache_key)
+
+    if parsed_questions is None:
+        with stage('generate'):
+            parsed_questions = question_generator.generate(pdf_text, story.difficulty)
+
+        if parsed_questions:
+            generation_cache.set(cache_key, parsed_questions)
+
+    with stage('persist'):
+        quiz, _questions = save_story_quiz(
+            story,
+            pdf_text,
+            f"Quiz for {story.title} ({story.difficulty.capitalize()})",
+            parsed_questions
+        )
+
+    return quiz
@@ -0,0 +1,103 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .answer_keys import answer_keys
+from .models import Answer, Question, QuizAttempt
+
+class AttemptCompleted(Exception):
+    pass
+
+class InvalidSubmission(Exception):
+    pass
+
+def _question_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Question.DoesNotExist(f"Invalid question id: {value!r}")
+
+def grade(answer_key, question_id, user_answer):
+    """Whether `user_answer` is the correct letter for the question"""
+    return user_answer.strip().upper() == answer_key[question_id]
+
+def submit_answers(user, attempt_id, answers):
+    """
+    Grade and store a batch of answers, then update the attempt once.
+
+    `answers` is a list of dicts with question_id, answer and optionally
+    emotions. The attempt row is locked for the whole submission so concurrent
+    submissions to the same attempt are counted one after the other. Grading
+    uses the cached answer key and all answers are inserted with one
+    bulk_create; the answered/correct counters on the attempt are incremented
+    with F-expressions, and completion and score come from them.
+    Returns the attempt and the (question id, is_correct) pairs in order.
+    """
+    if not isinstance(answers, list) or not answers:
+        raise InvalidSubmission("Provide a non-empty list of answers")
+
+    with transaction.atomic():
+        attempt = (
+            QuizAttempt.objects
+            .select_for_update(of=('self',))
+            .select_related('quiz__story')
+            .get(id=attempt_id, user=user)
+        )
+        if attempt.completed:
+            raise AttemptCompleted("This quiz attempt has already been completed")
+
+        answer_key = answer_keys.get(attempt.quiz_id)
+        graded = []
+        rows = []
+        seen = set()
+        for item in answers:
+            if not isinstance(item, dict) or not isinstance(item.get('answer'), str):
+                raise InvalidSubmission("Each answer needs a question_id and an answer")
+            question_id = _question_id(item.get('question_id'))
+            if question_id not in answer_key:
+                raise Question.DoesNotExist(f"Question {question_id} is not part of this quiz")
+            if question_id in seen:
+                raise InvalidSubmission(f"Question {question_id} is answered twice")
+            seen.add(question_id)
+
+            is_correct = grade(answer_key, question_id, item['answer'])
+            graded.append((question_id, is_correct))
+            rows.append(Answer(
+                attempt=attempt,
+                question_id=question_id,
+                user_answer=item['answer'],
+                is_correct=is_correct
+            ))
+            attempt.emotions_log[str(question_id)] = item.get('emotions', {})
+
+        try:
+            Answer.objects.bulk_create(rows)
+        except IntegrityError:
+            raise InvalidSubmission("Some of these questions have already been answered")
+
+        correct = sum(is_correct for _, is_correct in graded)
+        answered_count = attempt.answered_count + len(rows)
+        correct_count = attempt.correct_count + correct
+        # Increment in SQL so the counters stay right even for writers that don't take the lock
+        attempt.answered_count = F('answered_count') + len(rows)
+        attempt.correct_count = F('correct_count') + correct
+        update_fields = ['emotions_log', 'answered_count', 'correct_count']
+
+        if not attempt.total_questions:
+            # Attempts started before the counter existed and missed the backfill
+            attempt.total_questions = len(answer_key)
+            update_fields.append('total_questions')
+        if answered_count >= attempt.total_questions:
+            attempt.completed = True
+            attempt.score = (correct_count / attempt.total_questions) * 100
+            update_fields += ['completed', 'score']  # save() stamps completed_at
+
+        attempt.save(update_fields=update_fields)
+        attempt.answered_count, attempt.correct_count = answered_count, correct_count
+
+    return attempt, graded
+
+def submit_answer(user, attempt_id, question_id, user_answer, emotions):
+    """Grade and store one answer; returns the attempt and whether the answer was correct"""
+    attempt, graded = submit_answers(user, attempt_id, [
+        {'question_id': question_id, 'answer': user_answer, 'emotions': emotions}
+    ])
+    return attempt, graded[0][1]
@@ -1,3 +1,1453 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
+import cv2
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import Profile
+from studentapp_backend.llm import LLMClient, LLMError, LLMTimeout, StubBackend
+from .chunking import estimate_tokens, split_text, spread
+from . import pdf_extraction
+from .pdf_extraction import PDFTooLargeError, extract_text
+from .generation import JSON_GENERATION_CONFIG, QuestionGenerator, select_questions
+from .generation_cache import GenerationCache
+from .answer_keys import AnswerKey, AnswerKeyCache, answer_keys
+from .emotion_inference import EMOTION_LABELS, EmotionModel, analyze_frames, InferenceBatcher, decode_frame, emotion_batcher, emotion_model
+from .emotion_storage import EmotionSeries
+from .emotion_sessions import EmotionSession, EmotionSessionStore, timestamp_ms
+from .models import Answer, PointsAward, PooledQuestion, Question, Quiz, QuizAttempt, QuizGenerationJob, Story
+from .question_bank import assemble_quiz, fill_pool, pool_stats
+from . import jobs
+from .jobs import background_executor, run_pool_fill, submit_pool_fill
+from .regeneration import RegenerationPool, regeneration_pool
+from .parsing import parse_questions
+from .persistence import create_quiz, question_payload, save_story_quiz
 
-# Create your tests here.
+SAMPLE_RESPONSE = """Here are your questions:
+
+Q1. What does LIFO describe?
+A) A stack
+B) A queue
+C) A heap
+D) A graph
+Answer: A
+
+Q2. Which structure is FIFO?
+A) Stack
+B) Queue
+C) Tree
+D) Trie
+Answer: B
+"""
+
+def make_pdf(page_texts):
+    """A minimal PDF with one line of Helvetica text per page"""
+    count = len(page_texts)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(count)) + b"] /Count %d >>" % count,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    for index, text in enumerate(page_texts):
+        stream = b"BT /F1 12 Tf 72 720 Td (" + text.encode('latin-1') + b") Tj ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * index)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+class ParseQuestionsTests(SimpleTestCase):
+    def test_canonical_format(self):
+        questions = parse_questions(SAMPLE_RESPONSE)
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(questions[0], {
+            'question_text': 'What does LIFO describe?',
+            'option_a': 'A stack',
+            'option_b': 'A queue',
+            'option_c': 'A heap',
+            'option_d': 'A graph',
+            'correct_answer': 'A'
+        })
+        self.assertEqual(questions[1]['correct_answer'], 'B')
+
+    def test_format_variants(self):
+        response = """**Question 1:** Which sort is stable?
+(a) Quicksort
+(b) Merge sort
+(c) Heapsort
+(d) Selection sort
+**Correct Answer - B**
+1) What is the height of a single node tree?
+- A. 0
+- B. 1
+- C. 2
+- D. Undefined
+Answer: (A) 0"""
+        questions = parse_questions(response)
+        self.assertEqual([q['correct_answer'] for q in questions], ['B', 'A'])
+        self.assertEqual(questions[0]['question_text'], 'Which sort is stable?')
+        self.assertEqual(questions[0]['option_b'], 'Merge sort')
+        self.assertEqual(questions[1]['option_d'], 'Undefined')
+
+    def test_wrapped_lines_and_missing_blank_lines(self):
+        response = """Q1. Which of these is balanced
+and keeps keys sorted?
+A) 2-3 tree
+B) Linked list
+C) Hash table
+   with chaining
+D) Array
+Answer: A
+Q2. Second?
+A) w
+B) x
+C) y
+D) z
+Answer: D"""
+        questions = parse_questions(response)
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(questions[0]['question_text'], 'Which of these is balanced and keeps keys sorted?')
+        self.assertEqual(questions[0]['option_c'], 'Hash table with chaining')
+
+    def test_incomplete_questions_are_dropped(self):
+        response = """Q1. Missing an option
+A) one
+B) two
+C) three
+Answer: A
+
+Q2. Missing the answer
+A) one
+B) two
+C) three
+D) four
+
+Q3. Complete
+A) one
+B) two
+C) three
+D) four
+Answer: C"""
+        questions = parse_questions(response)
+        self.assertEqual([q['question_text'] for q in questions], ['Complete'])
+
+    def test_fuzzed_formatting(self):
+        rng = random.Random(1234)
+        question_styles = ['Q{n}. {t}', '{n}. {t}', 'Question {n}: {t}', '**Q{n}.** {t}', 'Q{n}) {t}']
+        option_styles = ['{l}) {t}', '({l}) {t}', '{l}. {t}', '- {l}) {t}', '{lower}) {t}']
+        answer_styles = ['Answer: {l}', 'Answer - {l}', '**Answer:** {l}', 'Correct answer: ({l})', 'Answer: {l}) {t}']
+
+        for _ in range(200):
+            expected = []
+            blocks = []
+            for n in range(1, rng.randint(1, 8) + 1):
+                text = f"Question text {rng.randint(0, 10**6)}?"
+                options = [f"choice {rng.randint(0, 10**6)}" for _ in range(4)]
+                answer = rng.choice('ABCD')
+                lines = [rng.choice(question_styles).format(n=n, t=text)]
+                for letter, option in zip('ABCD', options):
+                    lines.append(rng.choice(option_styles).format(l=letter, lower=letter.lower(), t=option))
+                lines.append(rng.choice(answer_styles).format(l=answer, t=options['ABCD'.index(answer)]))
+                blocks.append(rng.choice(['\n', '\n\n', '\r\n']).join(lines))
+                expected.append((text, options, answer))
+
+            questions = parse_questions(rng.choice(['\n', '\n\n', '\n\n\n']).join(blocks))
+            self.assertEqual(len(questions), len(expected))
+            for question, (text, options, answer) in zip(questions, expected):
+                self.assertEqual(question['question_text'], text)
+                self.assertEqual(
+                    [question['option_a'], question['option_b'], question['option_c'], question['option_d']],
+                    options
+                )
+                self.assertEqual(question['correct_answer'], answer)
+
+    def test_random_noise_never_raises(self):
+        rng = random.Random(42)
+        alphabet = 'QA1234)(.:- \n*abcdABCD'
+        for _ in range(500):
+            noise = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+            for question in parse_questions(noise):
+                self.assertIn(question['correct_answer'], 'ABCD')
+
+    def test_prose_starting_like_an_answer_or_number_is_continuation(self):
+        response = """Q1. Which structure is LIFO?
+A) Stack
+B) Queue
+C) Heap
+D) Graph
+Answer: A
+
+Q2. How long is the span?
+A) 1 m
+B) 2 m
+C) 3 m
+D) 3.5 m
+3.5 metres is the distance between the towers.
+Answer: D"""
+        questions = parse_questions(response)
+        self.assertEqual([q['correct_answer'] for q in questions], ['A', 'D'])
+        self.assertEqual(questions[1]['option_d'], '3.5 m 3.5 metres is the distance between the towers.')
+
+        wrapped = """Q1. Which structure would you pick as the
+answer a bit faster than a list?
+Answer: a bit of a trick question
+A) Set
+B) List
+C) Tuple
+D) Deque
+Answer: A"""
+        questions = parse_questions(wrapped)
+        self.assertEqual(len(questions), 1)
+        self.assertEqual(
+            questions[0]['question_text'],
+            'Which structure would you pick as the answer a bit faster than a list? Answer: a bit of a trick question'
+        )
+
+    def test_large_responses(self):
+        response = '\n\n'.join(SAMPLE_RESPONSE.split('\n\n')[1:] * 2500)  # 5000 questions
+        self.assertEqual(len(parse_questions(response)), 5000)
+
+class FakeBackend:
+    """LLM backend replaying canned responses"""
+    transient_errors = ()
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def generate(self, model, contents, generation_config=None, timeout=None):
+        self.calls.append(generation_config)
+        return self.responses.pop(0)
+
+class QuestionGeneratorTests(SimpleTestCase):
+    def generate(self, backend):
+        generator = QuestionGenerator(client=LLMClient(backend))
+        return generator, generator.generate('Some text', 'easy')
+
+    def test_json_output_is_validated_into_records(self):
+        backend = FakeBackend(json.dumps([
+            {'question': 'What is a stack?', 'options': ['A) LIFO', 'FIFO', 'Tree', 'Graph'], 'answer': 'A'},
+            {'question': 'Missing options', 'options': ['x'], 'answer': 'B'},
+            {'question': 'What is a queue?', 'options': {'A': 'LIFO', 'B': 'FIFO', 'C': 'Tree', 'D': 'Graph'}, 'answer': 'b'}
+        ]))
+        generator, questions = self.generate(backend)
+        self.assertEqual(backend.calls, [JSON_GENERATION_CONFIG])
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(questions[0]['option_a'], 'LIFO')
+        self.assertEqual(questions[1]['correct_answer'], 'B')
+        self.assertEqual(generator.stats()['json'], 1)
+
+    def test_text_layout_is_parsed_without_a_second_call(self):
+        backend = FakeBackend(SAMPLE_RESPONSE)
+        generator, questions = self.generate(backend)
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(len(backend.calls), 1)
+        self.assertEqual(generator.stats()['text_fallback'], 1)
+
+    def test_retry_with_simplified_prompt(self):
+        backend = FakeBackend('not json, no questions', SAMPLE_RESPONSE)
+        generator, questions = self.generate(backend)
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(backend.calls, [JSON_GENERATION_CONFIG, None])
+        self.assertEqual(generator.stats()['retry'], 1)
+
+    def test_failed_generation_is_counted(self):
+        generator, questions = self.generate(FakeBackend('[]', 'nothing useful'))
+        self.assertEqual(questions, [])
+        self.assertEqual(generator.stats()['failed'], 1)
+
+    def test_stub_backend_is_deterministic(self):
+        first = self.generate(StubBackend())[1]
+        second = self.generate(StubBackend())[1]
+        self.assertEqual(len(first), 5)
+        self.assertEqual(first, second)
+
+class PDFExtractionTests(SimpleTestCase):
+    def write_pdf(self, page_texts):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'story.pdf')
+        with open(path, 'wb') as f:
+            f.write(make_pdf(page_texts))
+        return path
+
+    def test_small_documents_are_extracted_in_order(self):
+        path = self.write_pdf(['First page', 'Second page'])
+        with mock.patch('quiz.pdf_extraction.get_process_pool') as get_pool:
+            self.assertEqual(extract_text(path), 'First page\nSecond page')
+        get_pool.assert_not_called()
+
+    def test_file_size_limit(self):
+        path = self.write_pdf(['Some text'])
+        with self.settings(PDF_MAX_BYTES=os.path.getsize(path) - 1), self.assertRaises(PDFTooLargeError):
+            extract_text(path)
+
+    def test_page_limit(self):
+        path = self.write_pdf(['One', 'Two', 'Three'])
+        with self.settings(PDF_MAX_PAGES=2), self.assertRaises(PDFTooLargeError):
+            extract_text(path)
+        self.assertEqual(extract_text(path, max_pages=3), 'One\nTwo\nThree')
+
+    def test_text_limit(self):
+        path = self.write_pdf(['abcdef', 'ghijkl', 'mnopqr'])
+        self.assertEqual(extract_text(path, max_chars=9), 'abcdef\nghi')
+        with self.settings(PDF_MAX_TEXT_CHARS=6):
+            self.assertEqual(extract_text(path), 'abcdef')
+
+    def test_large_documents_are_extracted_across_processes_in_order(self):
+        pages = [f"Page {number}" for number in range(40)]
+        path = self.write_pdf(pages)
+        self.addCleanup(setattr, pdf_extraction, '_process_pool', None)
+        with mock.patch('quiz.pdf_extraction._process_pool', None), self.settings(
+            PDF_PARALLEL_PAGE_THRESHOLD=8, PDF_PAGES_PER_TASK=6, PDF_EXTRACTION_PROCESSES=2
+        ):
+            try:
+                self.assertEqual(extract_text(path), '\n'.join(pages))
+            finally:
+                pdf_extraction._process_pool.shutdown()
+
+    def test_remaining_ranges_are_cancelled_on_early_stop(self):
+        path = self.write_pdf([f"Page {number}" for number in range(10)])
+        submitted = []
+
+        def submit(function, path, start, stop):
+            future = Future()
+            if not start:
+                future.set_result(function(path, start, stop))
+            submitted.append(future)
+            return future
+
+        pool = mock.Mock(submit=submit)
+        with mock.patch('quiz.pdf_extraction.get_process_pool', return_value=pool), self.settings(
+            PDF_PARALLEL_PAGE_THRESHOLD=4, PDF_PAGES_PER_TASK=3
+        ):
+            # The first range covers the text budget, so the others are never waited on
+            self.assertEqual(extract_text(path, max_chars=10), 'Page 0\nPage')
+        self.assertEqual(len(submitted), 4)
+        self.assertTrue(all(future.cancelled() for future in submitted[1:]))
+
+class ChunkingTests(SimpleTestCase):
+    def test_chunks_respect_budget_and_sections(self):
+        sections = [f"Chapter {n}\n" + ' '.join(f"Sentence {n}.{i} about trees." for i in range(40)) for n in range(1, 6)]
+        chunks = split_text('\n'.join(sections), max_tokens=300)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 300)
+        self.assertTrue(all(chunk.startswith('Chapter') or chunk.startswith('Sentence') for chunk in chunks))
+        self.assertEqual(' '.join(' '.join(chunks).split()), ' '.join('\n'.join(sections).split()))
+
+    def test_unbroken_text_is_split(self):
+        chunks = split_text('x' * 10000, max_tokens=100)
+        self.assertEqual(len(chunks), 25)
+
+    def test_spread_keeps_first_and_spans_document(self):
+        self.assertEqual(spread(list(range(10)), 3), [0, 3, 6])
+        self.assertEqual(spread([1, 2], 5), [1, 2])
+
+class MapReduceGenerationTests(SimpleTestCase):
+    def test_select_round_robins_and_dedupes(self):
+        def question(text):
+            return {'question_text': text}
+        selected = select_questions([
+            [question('What is a stack?'), question('What is a heap?')],
+            [question('what is a STACK'), question('What is a trie?')],
+            [question('What is a graph?')]
+        ], count=3)
+        self.assertEqual(
+            [q['question_text'] for q in selected],
+            ['What is a stack?', 'What is a graph?', 'What is a heap?']
+        )
+
+    def test_long_text_is_generated_per_chunk(self):
+        text = '\n\n'.join(f"Section {n} " + 'word ' * 300 for n in range(6))
+        generator = QuestionGenerator(client=LLMClient(StubBackend()), chunk_tokens=500, max_chunks=4)
+        questions = generator.generate(text, 'medium')
+        self.assertEqual(len(questions), 5)
+        self.assertEqual(len({q['question_text'] for q in questions}), 5)
+        self.assertEqual(generator.stats()['json'], 4)
+
+    def test_a_failing_chunk_is_dropped(self):
+        text = '\n\n'.join(f"Section {n} " + ('blocked ' if n == 1 else 'word ') * 300 for n in range(4))
+        generator = QuestionGenerator(client=LLMClient(BlockingBackend()), chunk_tokens=500, max_chunks=4)
+        questions = generator.generate(text, 'medium')
+        self.assertEqual(len(questions), 5)
+
+        with self.assertRaises(LLMError):
+            generator.generate('Only blocked text.', 'medium')
+
+    def test_duplicate_chunks_are_deduplicated(self):
+        text = '\n\n'.join(['The same paragraph about queues. ' * 40] * 3)
+        generator = QuestionGenerator(client=LLMClient(StubBackend()), chunk_tokens=400)
+        questions = generator.generate(text, 'easy')
+        self.assertEqual(generator.stats()['json'], 3)
+        self.assertEqual(len({q['question_text'] for q in questions}), len(questions))
+
+class BlockingBackend(StubBackend):
+    """Stub backend that refuses prompts mentioning a blocked word, the way Gemini's response.text does"""
+
+    def generate(self, model, contents, generation_config=None, timeout=None):
+        if 'blocked' in contents:
+            raise ValueError("The response.text quick accessor only works when the response contains a valid Part")
+        return super().generate(model, contents, generation_config, timeout)
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def generate(self, model, contents, generation_config=None, timeout=None):
+        self.prompts.append(contents)
+        return super().generate(model, contents, generation_config=generation_config, timeout=timeout)
+
+class RegenerationPoolTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backend = CountingBackend()
+        self.submitted = []
+        self.pool = RegenerationPool(
+            GenerationCache(directory.name),
+            QuestionGenerator(client=LLMClient(self.backend)),
+            size=2,
+            submit=lambda fn, *args: self.submitted.append((fn, args))
+        )
+
+    def run_submitted(self):
+        while self.submitted:
+            fn, args = self.submitted.pop(0)
+            fn(*args)
+
+    def test_refill_probes_are_not_counted_as_cache_lookups(self):
+        self.pool.questions('Sorting.', 'easy', variant=1)
+        self.assertEqual(len(self.submitted), 2)
+        stats = self.pool.cache.stats()
+        self.assertEqual((stats['misses'], stats['memory_hits'], stats['disk_hits']), (1, 0, 0))
+
+    def test_miss_generates_then_refills_next_variants(self):
+        first = self.pool.questions('Stacks and queues.', 'easy', variant=1)
+        self.assertEqual(len(first), 5)
+        self.assertEqual(len(self.submitted), 2)
+        self.run_submitted()
+        self.assertEqual(len(self.backend.prompts), 3)
+
+        second = self.pool.questions('Stacks and queues.', 'easy', variant=2)
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.pool.stats()['hits'], 1)
+        # Variant 3 is already cached, only variant 4 needs generating
+        self.assertEqual(len(self.submitted), 1)
+
+    def test_variants_are_memoized_by_text(self):
+        first = self.pool.questions('Heaps.', 'hard', variant=1)
+        self.assertEqual(self.pool.questions('Heaps.', 'hard', variant=1), first)
+        self.assertEqual(len(self.backend.prompts), 1)
+
+    def test_queued_variants_are_not_submitted_twice(self):
+        self.pool.refill('Tries.', 'medium', 1)
+        self.pool.refill('Tries.', 'medium', 1)
+        self.assertEqual(len(self.submitted), 2)
+        self.assertEqual(self.pool.stats()['in_flight'], 2)
+
+class GenerationCacheTests(SimpleTestCase):
+    def make_cache(self, **kwargs):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return GenerationCache(directory.name, **kwargs)
+
+    def test_memory_tier_is_an_lru(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)  # evicts b, the least recently used
+        self.assertEqual(cache.stats()['memory_entries'], 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['memory_hits'], 2)
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+
+    def test_memory_tier_is_bounded_by_size(self):
+        cache = self.make_cache(max_memory_bytes=1000)
+        cache.set('text:large', 'x' * 2000)
+        self.assertEqual(cache.stats()['memory_entries'], 0)
+        self.assertEqual(cache.get('text:large'), 'x' * 2000)
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+        self.assertEqual(cache.stats()['memory_entries'], 0)
+
+        for n in range(5):
+            cache.set(f'text:{n}', 'y' * 300)
+        stats = cache.stats()
+        self.assertLessEqual(stats['memory_bytes'], 1000)
+        self.assertEqual(stats['memory_entries'], 2)
+        self.assertEqual(cache.get('text:4'), 'y' * 300)
+        self.assertEqual(cache.stats()['memory_hits'], 1)
+
+    def test_disk_hit_after_clear(self):
+        cache = self.make_cache()
+        cache.set('questions:abc', [{'question_text': 'Q?'}])
+        cache.clear()
+        self.assertEqual(cache.stats()['memory_bytes'], 0)
+        self.assertEqual(cache.get('questions:abc'), [{'question_text': 'Q?'}])
+        self.assertEqual(cache.get('questions:abc'), [{'question_text': 'Q?'}])
+        stats = cache.stats()
+        self.assertEqual((stats['disk_hits'], stats['memory_hits']), (1, 1))
+
+    def test_entries_expire_in_both_tiers(self):
+        cache = self.make_cache(ttl=60)
+        with mock.patch('quiz.generation_cache.time.time', return_value=1000.0):
+            cache.set('memory', 'value')
+            cache.set('disk', 'value')
+            cache.clear()
+            cache.get('memory')  # only this one is back in memory; both are on disk
+        with mock.patch('quiz.generation_cache.time.time', return_value=1061.0):
+            self.assertIsNone(cache.get('memory'))
+            self.assertIsNone(cache.get('disk'))
+        self.assertFalse(os.path.exists(cache._path('memory')))
+        self.assertFalse(os.path.exists(cache._path('disk')))
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['memory_entries']), (2, 0))
+
+    def test_prune(self):
+        cache = self.make_cache(max_disk_entries=2, ttl=3600)
+        now = time.time()
+        for age, key in [(7200, 'expired'), (30, 'oldest'), (20, 'older'), (10, 'newest')]:
+            cache.set(key, key)
+            os.utime(cache._path(key), (now - age, now - age))
+
+        self.assertEqual(cache.prune(), 2)
+        self.assertEqual(
+            [os.path.exists(cache._path(key)) for key in ('expired', 'oldest', 'older', 'newest')],
+            [False, False, True, True]
+        )
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_hit_rate(self):
+        cache = self.make_cache()
+        cache.set('key', 'value')
+        cache.get('key')
+        cache.get('missing')
+        cache.clear()
+        cache.get('key')
+        stats = cache.stats()
+        self.assertEqual(
+            (stats['sets'], stats['memory_hits'], stats['disk_hits'], stats['misses']), (1, 1, 1, 1)
+        )
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backend = CountingBackend()
+        for target, value in [
+            ('quiz.question_bank.generation_cache', GenerationCache(directory.name)),
+            ('quiz.question_bank.question_generator', QuestionGenerator(client=LLMClient(self.backend)))
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        user = get_user_model().objects.create_user(username='reader', email='reader@example.com', password='password')
+        self.story = Story.objects.create(
+            user=user, title='Trees', generated_story='Binary trees and heaps.', difficulty='easy'
+        )
+
+    def test_fill_pool_tops_up_to_target(self):
+        self.assertEqual(fill_pool(self.story, target=12), 15)
+        self.assertEqual(len(self.backend.prompts), 3)
+        self.assertEqual(fill_pool(self.story, target=12), 0)
+        self.assertEqual(len(self.backend.prompts), 3)
+
+    def test_fills_run_off_the_generation_pool(self):
+        # The mocked executor never runs the fill, which would clear its pending marker
+        self.addCleanup(jobs._pool_fills.discard, (self.story.id, 'easy'))
+        with mock.patch('quiz.jobs.executor') as generation, mock.patch('quiz.jobs.background_executor') as background:
+            submit_pool_fill(self.story)
+            submit_pool_fill(self.story)
+        background.submit.assert_called_once_with(run_pool_fill, self.story.id, 'easy')
+        generation.submit.assert_not_called()
+        self.assertIs(regeneration_pool._submit.__self__, background_executor)
+
+    def test_regenerate_reports_generation_failures(self):
+        client = APIClient()
+        client.force_authenticate(self.story.user)
+        with mock.patch('quiz.views.submit_pool_fill'), \
+                mock.patch.object(regeneration_pool, 'questions', side_effect=LLMTimeout("LLM call exceeded its deadline")):
+            response = client.post(reverse('regenerate-quiz', args=[self.story.id]))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('error', response.data)
+        self.assertFalse(self.story.quizzes.exists())
+
+    def test_assemble_quiz_samples_least_used_questions(self):
+        self.assertIsNone(assemble_quiz(self.story, 'Empty'))
+        fill_pool(self.story, target=10)
+
+        prompts = len(self.backend.prompts)
+        first, first_questions = assemble_quiz(self.story, 'First')
+        second, second_questions = assemble_quiz(self.story, 'Second')
+        self.assertEqual(len(self.backend.prompts), prompts)
+        self.assertEqual(first.questions.count(), 5)
+        # With ten questions the second quiz gets the five that weren't used yet
+        self.assertFalse(
+            {q.question_text for q in first_questions} & {q.question_text for q in second_questions}
+        )
+        self.assertFalse(PooledQuestion.objects.filter(times_used=0).exists())
+
+    def test_pool_stats(self):
+        fill_pool(self.story, target=10)
+        assemble_quiz(self.story, 'First')
+        assemble_quiz(self.story, 'Second')
+        assemble_quiz(self.story, 'Third')
+        stats = pool_stats()
+        self.assertEqual(stats['pools'], 1)
+        self.assertEqual(stats['questions'], 10)
+        self.assertEqual(stats['questions_served'], 15)
+        self.assertAlmostEqual(stats['reuse_rate'], 5 / 15)
+
+class GenerationJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for target, value in [
+            ('quiz.services.generation_cache', GenerationCache(cache_dir.name)),
+            ('quiz.services.question_generator', QuestionGenerator(client=LLMClient(StubBackend()))),
+            # Jobs normally run on worker threads that own their connection; here they share the test's
+            ('quiz.jobs.close_old_connections', mock.Mock()),
+            ('quiz.jobs.connection', mock.Mock()),
+            ('quiz.jobs.submit_pool_fill', mock.Mock())
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(username='author', email='author@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        pdf = SimpleUploadedFile('trees.pdf', make_pdf(['Binary trees and heaps.']), content_type='application/pdf')
+        return self.client.post(reverse('create-story'), {'title': 'Trees', 'pdf_file': pdf, 'difficulty': 'easy'})
+
+    def test_upload_returns_a_pending_job(self):
+        with mock.patch('quiz.jobs.executor') as executor, self.captureOnCommitCallbacks(execute=True):
+            response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        job = QuizGenerationJob.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.status, job.user, job.story.id), ('pending', self.user, response.data['id']))
+        executor.submit.assert_called_once_with(jobs.run_generation_job, job.id)
+
+    def test_jobs_are_only_visible_to_their_user(self):
+        with mock.patch('quiz.jobs.executor'), self.captureOnCommitCallbacks(execute=True):
+            job_id = self.upload().data['job_id']
+        url = reverse('generation-job-detail', args=[job_id])
+        self.assertEqual(self.client.get(url).data['status'], 'pending')
+
+        other = get_user_model().objects.create_user(username='other', email='other@example.com', password='password')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_run_generation_job(self):
+        with mock.patch('quiz.jobs.executor'), self.captureOnCommitCallbacks(execute=True):
+            job_id = self.upload().data['job_id']
+        jobs.run_generation_job(job_id)
+
+        job = QuizGenerationJob.objects.get(id=job_id)
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.quiz.questions.count(), 5)
+        self.assertEqual(set(job.stage_timings), {'extract', 'generate', 'persist'})
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.story.generated_story, 'Binary trees and heaps.')
+        jobs.submit_pool_fill.assert_called_once()
+
+    def test_failed_generation_is_recorded(self):
+        with mock.patch('quiz.jobs.executor'), self.captureOnCommitCallbacks(execute=True):
+            job_id = self.upload().data['job_id']
+        with mock.patch('quiz.jobs.generate_story_quiz', side_effect=LLMError('quota exceeded')):
+            jobs.run_generation_job(job_id)
+
+        job = QuizGenerationJob.objects.get(id=job_id)
+        self.assertEqual((job.status, job.error, job.quiz), ('failed', 'quota exceeded', None))
+        self.assertIsNotNone(job.finished_at)
+        jobs.submit_pool_fill.assert_not_called()
+
+    def test_stale_jobs_are_failed(self):
+        with mock.patch('quiz.jobs.executor'), self.captureOnCommitCallbacks(execute=True):
+            job_id = self.upload().data['job_id']
+        url = reverse('generation-job-detail', args=[job_id])
+        # Polling a live job only reads it
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).data['status'], 'pending')
+
+        # A restart dropped the queued job; once it is past the timeout polling reports it failed
+        QuizGenerationJob.objects.filter(id=job_id).update(created_at=timezone.now() - timedelta(hours=1))
+        response = self.client.get(url)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIn('interrupted', response.data['error'])
+
+    def test_fail_stale_generation_jobs_command(self):
+        with mock.patch('quiz.jobs.executor'), self.captureOnCommitCallbacks(execute=True):
+            job_id = self.upload().data['job_id']
+        call_command('fail_stale_generation_jobs', stdout=io.StringIO())
+        self.assertEqual(QuizGenerationJob.objects.get(id=job_id).status, 'pending')
+        call_command('fail_stale_generation_jobs', '--all', stdout=io.StringIO())
+        self.assertEqual(QuizGenerationJob.objects.get(id=job_id).status, 'failed')
+
+class PersistenceTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='writer', email='writer@example.com', password='password')
+        self.story = Story.objects.create(user=self.user, title='Sorting', generated_story='', difficulty='medium')
+        self.questions = parse_questions(SAMPLE_RESPONSE)
+
+    def test_create_quiz(self):
+        quiz, created = create_quiz(self.story, 'Sorting quiz', self.questions)
+        self.assertEqual([question.quiz_id for question in created], [quiz.id, quiz.id])
+        self.assertTrue(all(question.id for question in created))
+        self.assertEqual(question_payload(created[1]), {
+            'id': created[1].id,
+            'text': 'Which structure is FIFO?',
+            'options': ['A) Stack', 'B) Queue', 'C) Tree', 'D) Trie']
+        })
+
+    def test_create_quiz_is_atomic(self):
+        with self.assertRaises(TypeError):
+            create_quiz(self.story, 'Broken quiz', [*self.questions, {'question': 'Not a question field'}])
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_save_story_quiz(self):
+        quiz, _created = save_story_quiz(self.story, 'Extracted text.', 'Sorting quiz', self.questions)
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.generated_story, 'Extracted text.')
+        self.assertEqual(quiz.questions.count(), 2)
+
+class ImportQuizTests(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='admin', email='admin@example.com', password='password')
+        media_root = tempfile.TemporaryDirectory()
+        source = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.addCleanup(source.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.directory = source.name
+        with open(os.path.join(self.directory, 'sorting.pdf'), 'wb') as f:
+            f.write(make_pdf(['Sorting algorithms.']))
+        self.data = {
+            'title': 'Sorting',
+            'pdf_file': 'sorting.pdf',
+            'difficulty': 'easy',
+            'text': 'Sorting algorithms.',
+            'questions': parse_questions(SAMPLE_RESPONSE)
+        }
+
+    def import_quiz(self, data=None, content=None):
+        path = os.path.join(self.directory, 'quiz.json')
+        with open(path, 'w') as f:
+            f.write(json.dumps(data or self.data) if content is None else content)
+        call_command('import_quiz', 'admin@example.com', path, stdout=io.StringIO())
+
+    def test_import(self):
+        self.import_quiz()
+        story = Story.objects.get()
+        self.assertEqual((story.title, story.difficulty, story.generated_story), ('Sorting', 'easy', 'Sorting algorithms.'))
+        self.assertTrue(story.pdf_file.name.startswith('pdf_files/'))
+        with open(story.pdf_file.path, 'rb') as f:
+            self.assertEqual(f.read(), make_pdf(['Sorting algorithms.']))
+        quiz = story.quizzes.get()
+        self.assertEqual(quiz.title, 'Quiz for Sorting (Easy)')
+        self.assertEqual(list(quiz.questions.values_list('correct_answer', flat=True)), ['A', 'B'])
+
+    def test_invalid_input_is_reported(self):
+        cases = [
+            ({key: value for key, value in self.data.items() if key != 'title'}, 'missing title'),
+            ({key: value for key, value in self.data.items() if key != 'pdf_file'}, 'missing pdf_file'),
+            ({**self.data, 'pdf_file': 'missing.pdf'}, 'PDF file not found'),
+            ({**self.data, 'difficulty': 'extreme'}, 'Unknown difficulty'),
+            ({**self.data, 'questions': [{**self.data['questions'][0], 'correct_answer': 'E'}]}, 'invalid correct_answer'),
+            ({**self.data, 'questions': ['Q1?']}, 'must be an object')
+        ]
+        for data, message in cases:
+            with self.subTest(message), self.assertRaisesMessage(CommandError, message):
+                self.import_quiz(data)
+        with self.assertRaisesMessage(CommandError, 'not valid JSON'):
+            self.import_quiz(content='{"title": ')
+        with self.assertRaisesMessage(CommandError, 'Could not read'):
+            call_command('import_quiz', 'admin@example.com', os.path.join(self.directory, 'missing.json'))
+        with self.assertRaisesMessage(CommandError, 'No user'):
+            call_command('import_quiz', 'nobody@example.com', os.path.join(self.directory, 'quiz.json'))
+        self.assertFalse(Story.objects.exists())
+
+class AttemptTestCase(TestCase):
+    def setUp(self):
+        answer_keys.clear()
+        self.user = get_user_model().objects.create_user(username='student', email='student@example.com', password='password')
+        story = Story.objects.create(user=self.user, title='Graphs', generated_story='Graphs.', difficulty='hard')
+        self.quiz = Quiz.objects.create(story=story, title='Graphs quiz')
+        self.questions = Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text=f"Question {n}?", correct_answer=letter)
+            for n, letter in enumerate('ABC')
+        ])
+        self.attempt = QuizAttempt.objects.create(user=self.user, quiz=self.quiz)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('submit-answer', args=[self.attempt.id])
+
+    def submit(self, question, answer):
+        return self.client.post(self.url, {'question_id': question.id, 'answer': answer}, format='json')
+
+class SubmitAnswerTests(AttemptTestCase):
+    def test_answers_are_graded_and_the_attempt_completed(self):
+        self.assertTrue(self.submit(self.questions[0], ' a ').data['is_correct'])
+        self.assertFalse(self.submit(self.questions[1], 'C').data['is_correct'])
+        response = self.submit(self.questions[2], 'C')
+        self.assertTrue(response.data['completed'])
+        self.assertAlmostEqual(response.data['score'], 200 / 3)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual((self.attempt.answered_count, self.attempt.correct_count), (3, 2))
+        self.assertEqual(Answer.objects.filter(attempt=self.attempt).count(), 3)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.total_points, profile.current_streak), (19, 1))
+        self.assertIsNotNone(self.attempt.completed_at)
+
+        self.assertEqual(self.submit(self.questions[0], 'A').status_code, 400)
+
+    def test_unknown_question(self):
+        other_quiz = Quiz.objects.create(story=self.quiz.story, title='Other')
+        other = Question.objects.create(quiz=other_quiz, question_text='Elsewhere?')
+        self.assertEqual(self.submit(other, 'A').status_code, 404)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.answered_count, 0)
+
+    def test_query_budget(self):
+        # Warm the answer key, which then serves every submission of the quiz
+        answer_keys.get(self.quiz.id)
+
+        # Savepoint, lock the attempt, insert the answer, update the attempt, release
+        with self.assertNumQueries(5):
+            self.submit(self.questions[0], 'A')
+        with self.assertNumQueries(5):
+            self.submit(self.questions[1], 'B')
+        # Completing the quiz adds the points ledger insert (in a savepoint), one profile update
+        # and creating today's DailyPoints row (update, then insert in a savepoint), then
+        # looking up the attempt's emotion statistics
+        with self.assertNumQueries(14):
+            self.submit(self.questions[2], 'C')
+
+class AttemptCountersTests(AttemptTestCase):
+    def test_counters_track_answers(self):
+        self.assertEqual(self.attempt.total_questions, 3)
+        self.submit(self.questions[0], 'A')
+        self.submit(self.questions[1], 'A')
+        self.attempt.refresh_from_db()
+        self.assertEqual((self.attempt.answered_count, self.attempt.correct_count), (2, 1))
+        self.assertAlmostEqual(self.attempt.calculate_score(), 100 / 3)
+
+    def test_sync_command_backfills_and_verifies(self):
+        self.submit(self.questions[0], 'A')
+        self.submit(self.questions[1], 'B')
+        QuizAttempt.objects.filter(id=self.attempt.id).update(total_questions=0, answered_count=0, correct_count=0)
+
+        with self.assertRaises(CommandError):
+            call_command('sync_attempt_counters', '--check', stdout=io.StringIO())
+        call_command('sync_attempt_counters', stdout=io.StringIO())
+        call_command('sync_attempt_counters', '--check', stdout=io.StringIO())
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(
+            (self.attempt.total_questions, self.attempt.answered_count, self.attempt.correct_count),
+            (3, 2, 2)
+        )
+
+class CompletedAtTests(AttemptTestCase):
+    def test_completing_an_attempt_stamps_completed_at(self):
+        self.attempt.completed = True
+        self.attempt.save(update_fields=['completed'])
+        self.assertIsNotNone(QuizAttempt.objects.get(id=self.attempt.id).completed_at)
+
+    def test_completed_attempts_require_completed_at(self):
+        with self.assertRaises(IntegrityError):
+            QuizAttempt.objects.filter(id=self.attempt.id).update(completed=True)
+
+class PointsAwardTests(AttemptTestCase):
+    def complete(self):
+        QuizAttempt.objects.filter(id=self.attempt.id).update(completed=True, completed_at=timezone.now(), score=100)
+        return QuizAttempt.objects.select_related('quiz__story').get(id=self.attempt.id)
+
+    def test_points_are_awarded_once_per_attempt(self):
+        # Two workers holding their own copy of the same attempt
+        first, second = self.complete(), self.complete()
+        self.assertTrue(first.award_points())
+        self.assertFalse(second.award_points())
+        second.save()
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(profile.total_points, 30)
+        self.assertEqual(PointsAward.objects.get(attempt=self.attempt).points, 30)
+
+    def test_badge_and_streak_are_updated_in_sql(self):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        Profile.objects.filter(user=self.user).update(
+            total_points=490, current_streak=4, highest_streak=4, last_quiz_date=yesterday
+        )
+        self.complete().award_points()
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.total_points, profile.badge), (520, 'bronze'))
+        self.assertEqual((profile.current_streak, profile.highest_streak), (5, 5))
+        self.assertEqual(profile.last_quiz_date, timezone.now().date())
+
+    def test_broken_streak_restarts(self):
+        Profile.objects.filter(user=self.user).update(
+            current_streak=3, highest_streak=3, last_quiz_date=timezone.now().date() - timedelta(days=3)
+        )
+        self.complete().award_points()
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.current_streak, profile.highest_streak), (1, 3))
+
+class QuizHistoryTests(AttemptTestCase):
+    def add_completed_attempts(self, count):
+        for index in range(count):
+            quiz = Quiz.objects.create(story=self.quiz.story, title=f"Quiz {index}")
+            questions = Question.objects.bulk_create([
+                Question(quiz=quiz, question_text=f"Question {n}?", correct_answer='A') for n in range(4)
+            ])
+            attempt = QuizAttempt.objects.create(
+                user=self.user, quiz=quiz, completed=True, score=100,
+                completed_at=timezone.now() - timedelta(minutes=index)
+            )
+            Answer.objects.bulk_create([
+                Answer(attempt=attempt, question=question, user_answer='A', is_correct=True) for question in questions
+            ])
+
+    def test_expanded_history_query_count_does_not_grow_with_attempts(self):
+        # Attempts, quizzes with question counts, questions, answers
+        self.add_completed_attempts(2)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('quiz-history'), {'expand': 'details'})
+        results = response.data['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['quiz_details']['questions_count'], 4)
+        self.assertEqual(len(results[0]['answers']), 4)
+
+        self.add_completed_attempts(8)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('quiz-history'), {'expand': 'details'})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_summaries_are_cursor_paginated_newest_first(self):
+        self.add_completed_attempts(5)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('quiz-history'), {'page_size': 2})
+        self.assertEqual([result['quiz_title'] for result in response.data['results']], ['Quiz 0', 'Quiz 1'])
+        self.assertNotIn('answers', response.data['results'][0])
+
+        titles = []
+        url = response.data['next']
+        while url:
+            response = self.client.get(url)
+            titles += [result['quiz_title'] for result in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(titles, ['Quiz 2', 'Quiz 3', 'Quiz 4'])
+
+    def test_attempts_completed_at_the_same_time_are_paged_once(self):
+        self.add_completed_attempts(7)
+        QuizAttempt.objects.filter(user=self.user, completed=True).update(completed_at=timezone.now())
+
+        ids = []
+        url = reverse('quiz-history') + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            ids += [result['id'] for result in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, sorted(QuizAttempt.objects.filter(completed=True).values_list('id', flat=True), reverse=True))
+
+    def test_detail_query_count(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('attempt-detail', args=[self.attempt.id]))
+        self.assertEqual(response.data['quiz_details']['questions_count'], 3)
+
+class AnswerKeyTests(AttemptTestCase):
+    def test_compact_key_lookups(self):
+        answer_key = AnswerKey([(30, 'B'), (4, 'A'), (17, 'D')])
+        self.assertEqual(len(answer_key), 3)
+        self.assertEqual([answer_key[4], answer_key[17], answer_key[30]], ['A', 'D', 'B'])
+        self.assertNotIn(5, answer_key)
+        with self.assertRaises(KeyError):
+            answer_key[31]
+
+    def test_answers_longer_than_a_letter(self):
+        answer_key = AnswerKey([(1, 'B) Merge sort'), (2, ''), (3, 'É')])
+        self.assertEqual([answer_key[1], answer_key[2], answer_key[3]], ['B', ' ', ' '])
+
+        Question.objects.filter(id=self.questions[1].id).update(correct_answer='b) Queue')
+        Question.objects.filter(id=self.questions[2].id).update(correct_answer='')
+        self.assertTrue(self.submit(self.questions[1], 'B').data['is_correct'])
+        self.assertFalse(self.submit(self.questions[2], ' ').data['is_correct'])
+
+    def test_grading_is_served_from_memory(self):
+        answer_keys.get(self.quiz.id)
+        with self.assertNumQueries(0):
+            answer_key = answer_keys.get(self.quiz.id)
+        self.assertEqual(len(answer_key), 3)
+        self.assertEqual(answer_key[self.questions[2].id], 'C')
+
+    def test_question_changes_invalidate_the_key(self):
+        answer_keys.get(self.quiz.id)
+        question = self.questions[0]
+        question.correct_answer = 'D'
+        question.save()
+        self.assertEqual(answer_keys.get(self.quiz.id)[question.id], 'D')
+
+        Question.objects.create(quiz=self.quiz, question_text='Added?', correct_answer='B')
+        self.assertEqual(len(answer_keys.get(self.quiz.id)), 4)
+        question.delete()
+        self.assertEqual(len(answer_keys.get(self.quiz.id)), 3)
+
+    def test_lru_eviction(self):
+        cache = AnswerKeyCache(max_entries=1)
+        other_quiz = Quiz.objects.create(story=self.quiz.story, title='Other')
+        Question.objects.create(quiz=other_quiz, question_text='Other?')
+        cache.get(self.quiz.id)
+        cache.get(other_quiz.id)
+        cache.get(self.quiz.id)
+        self.assertEqual(cache.stats()['evictions'], 2)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+class SubmitAnswersBatchTests(AttemptTestCase):
+    def submit_batch(self, answers):
+        return self.client.post(
+            reverse('submit-answers-batch', args=[self.attempt.id]),
+            {'answers': [{'question_id': question.id, 'answer': answer} for question, answer in answers]},
+            format='json'
+        )
+
+    def test_batch_matches_per_question_grading(self):
+        answers = list(zip(self.questions, [' a ', 'C', 'c']))
+        response = self.submit_batch(answers)
+        self.assertEqual([result['is_correct'] for result in response.data['results']], [True, False, True])
+        self.assertTrue(response.data['completed'])
+        batch_attempt = QuizAttempt.objects.get(id=self.attempt.id)
+
+        QuizAttempt.objects.filter(id=self.attempt.id).delete()
+        Profile.objects.filter(user=self.user).update(total_points=0, current_streak=0, last_quiz_date=None)
+        self.attempt = QuizAttempt.objects.create(user=self.user, quiz=self.quiz)
+        self.url = reverse('submit-answer', args=[self.attempt.id])
+        for question, answer in answers:
+            self.submit(question, answer)
+        single_attempt = QuizAttempt.objects.get(id=self.attempt.id)
+
+        for field in ('score', 'completed', 'answered_count', 'correct_count'):
+            self.assertEqual(getattr(batch_attempt, field), getattr(single_attempt, field))
+        self.assertEqual(Profile.objects.get(user=self.user).total_points, 19)
+
+    def test_chunks_and_duplicates(self):
+        response = self.submit_batch([(self.questions[0], 'A')])
+        self.assertFalse(response.data['completed'])
+
+        self.assertEqual(self.submit_batch([(self.questions[1], 'B'), (self.questions[1], 'B')]).status_code, 400)
+        self.assertEqual(self.submit_batch([(self.questions[0], 'A'), (self.questions[1], 'B')]).status_code, 400)
+        self.assertEqual(Answer.objects.filter(attempt=self.attempt).count(), 1)
+
+        response = self.submit_batch([(self.questions[1], 'B'), (self.questions[2], 'C')])
+        self.assertEqual(response.data['score'], 100)
+
+    def test_batch_query_budget(self):
+        answer_keys.get(self.quiz.id)
+        # Savepoint, lock, one insert for all answers, update, ledger insert in a savepoint,
+        # profile update, DailyPoints update and insert in a savepoint, release, emotion statistics lookup
+        with self.assertNumQueries(14):
+            self.submit_batch(list(zip(self.questions, 'ABC')))
+
+def encode_frame(width=64, height=48):
+    return base64.b64encode(cv2.imencode('.png', np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()).decode()
+
+class InferenceBatcherTests(SimpleTestCase):
+    def test_submissions_share_model_calls(self):
+        calls = []
+        def analyze(frames):
+            calls.append(list(frames))
+            return [frame * 10 for frame in frames]
+
+        batcher = InferenceBatcher(analyze, batch_size=4, max_wait=0.5)
+        futures = [batcher.submit([1, 2]), batcher.submit([3, 4]), batcher.submit([5])]
+        self.assertEqual([future.result(timeout=5) for future in futures], [[10, 20], [30, 40], [50]])
+        self.assertEqual(calls, [[1, 2, 3, 4], [5]])
+        self.assertEqual(batcher.stats()['mean_batch_size'], 2.5)
+
+    def test_worker_pool_is_fixed(self):
+        batcher = InferenceBatcher(lambda frames: frames, batch_size=1, max_wait=0, workers=3)
+        futures = [batcher.submit([index]) for index in range(30)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [[index] for index in range(30)])
+        self.assertEqual(len(batcher._threads), 3)
+
+    def test_errors_reach_every_submission_in_the_batch(self):
+        def analyze(frames):
+            raise RuntimeError("model unavailable")
+
+        batcher = InferenceBatcher(analyze, batch_size=4, max_wait=0.5)
+        futures = [batcher.submit([1]), batcher.submit([2])]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+    def test_decode_frame_downscales(self):
+        self.assertEqual(decode_frame(encode_frame(640, 480), max_side=320).shape, (240, 320, 3))
+        self.assertEqual(decode_frame('data:image/png;base64,' + encode_frame()).shape, (48, 64, 3))
+        self.assertIsNone(decode_frame('not an image'))
+
+class CountingEmotionModel(EmotionModel):
+    def __init__(self, failures=0):
+        super().__init__()
+        self.builds = 0
+        self.failures = failures
+
+    def _build(self):
+        self.builds += 1
+        time.sleep(0.05)
+        if self.builds <= self.failures:
+            raise RuntimeError("weights unavailable")
+
+class FakeEmotionClient:
+    """Mirrors the input handling of deepface's EmotionClient.predict without loading weights"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, img):
+        batch = np.array(img)
+        self.batches.append(batch.shape)
+        gray = [cv2.resize(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY), (48, 48)) for face in batch]
+        scores = np.tile(np.arange(1, 8, dtype=np.float32), (len(gray), 1))
+        return scores[0] if len(gray) == 1 else scores
+
+class AnalyzeFramesTests(SimpleTestCase):
+    def analyze(self, frames):
+        client = FakeEmotionClient()
+        faces = lambda frame, **kwargs: [{'face': frame[:40, :30].astype(np.float32) / 255}]
+        with mock.patch('deepface.DeepFace.extract_faces', side_effect=faces), \
+                mock.patch('deepface.DeepFace.build_model', return_value=client):
+            return analyze_frames(frames), client.batches
+
+    def test_faces_are_classified_in_one_batch(self):
+        frames = [np.full((120, 160, 3), value, dtype=np.uint8) for value in (0, 80, 160)]
+        results, batches = self.analyze(frames)
+        self.assertEqual(batches, [(3, 224, 224, 3)])
+        self.assertEqual(len(results), 3)
+        self.assertAlmostEqual(results[0]['neutral'], 700 / 28)
+        self.assertAlmostEqual(sum(results[2].values()), 100, places=4)
+
+    def test_single_frame(self):
+        results, batches = self.analyze([np.zeros((48, 48, 3), dtype=np.uint8)])
+        self.assertEqual(batches, [(1, 224, 224, 3)])
+        self.assertEqual(len(results), 1)
+
+class EmotionModelTests(SimpleTestCase):
+    def test_model_is_loaded_once(self):
+        model = CountingEmotionModel()
+        threads = [threading.Thread(target=model.load) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((model.builds, model.status()['state']), (1, 'ready'))
+
+    def test_failed_loads_are_retried(self):
+        model = CountingEmotionModel(failures=1)
+        with self.assertRaises(RuntimeError):
+            model.load()
+        self.assertEqual(model.status()['error'], 'weights unavailable')
+        model.load()
+        self.assertTrue(model.ready)
+
+    def test_importing_the_app_does_not_load_the_cv_stack(self):
+        script = (
+            "import sys, django; django.setup(); import quiz.urls; "
+            "print(sorted(module for module in ('cv2', 'deepface', 'tensorflow') if module in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'studentapp_backend.settings'}
+        ).stdout
+        self.assertEqual(output.strip(), '[]')
+
+class EmotionSessionTests(SimpleTestCase):
+    def frames(self, count, seed=0):
+        rng = random.Random(seed)
+        return [{label: rng.uniform(0, 100) for label in EMOTION_LABELS} for _ in range(count)]
+
+    def test_running_statistics_match_the_frames(self):
+        frames = self.frames(500)
+        session = EmotionSession(1)
+        for start in range(0, len(frames), 32):
+            session.add_results(frames[start:start + 32], question_id=7 if start < 320 else 8)
+
+        summary = session.get_emotion_summary()
+        happy = [frame['happy'] for frame in frames]
+        self.assertEqual(summary['total_frames_analyzed'], 500)
+        self.assertAlmostEqual(summary['average_emotions']['happy'], statistics.fmean(happy))
+        self.assertAlmostEqual(summary['emotion_std']['happy'], statistics.pstdev(happy))
+        self.assertEqual(summary['questions']['7']['frames'], 320)
+        self.assertAlmostEqual(summary['questions']['8']['average_emotions']['happy'], statistics.fmean(happy[320:]))
+
+    def test_memory_does_not_grow_with_frames(self):
+        session = EmotionSession(1, sample_size=20)
+        for seed in range(50):
+            session.add_results(self.frames(100, seed))
+        summary = session.get_emotion_summary()
+        self.assertEqual((summary['total_frames_analyzed'], len(summary['frame_sample'])), (5000, 20))
+        self.assertNotIn('frame_sample', session.get_emotion_summary(include_sample=False))
+        self.assertIsNone(EmotionSession(2).get_emotion_summary())
+
+    def test_state_round_trips(self):
+        frames = self.frames(300)
+        whole = EmotionSession(1, sample_size=20)
+        whole.add_results(frames, question_id=7)
+
+        resumed = EmotionSession(1, sample_size=20)
+        for start in range(0, len(frames), 32):
+            resumed = EmotionSession.load(1, json.loads(json.dumps(resumed.dump())), sample_size=20)
+            resumed.add_results(frames[start:start + 32], question_id=7)
+
+        expected, summary = whole.get_emotion_summary(), resumed.get_emotion_summary()
+        self.assertEqual(summary['total_frames_analyzed'], 300)
+        self.assertEqual(len(summary['frame_sample']), 20)
+        for label in EMOTION_LABELS:
+            self.assertAlmostEqual(summary['average_emotions'][label], expected['average_emotions'][label])
+            self.assertAlmostEqual(summary['questions']['7']['emotion_std'][label], expected['questions']['7']['emotion_std'][label])
+
+class EmotionStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+
+    def test_round_trip_matches_the_session_summary(self):
+        rng = random.Random(0)
+        session = EmotionSession(5, sample_size=50)
+        for question_id in (11, 12, None):
+            session.add_results(
+                [{label: rng.uniform(0, 100) for label in EMOTION_LABELS} for _ in range(40)],
+                timestamps=['2026-01-01T10:00:00'] + [1767261600000 + index for index in range(39)],
+                question_id=question_id
+            )
+
+        with self.settings(MEDIA_ROOT=self.media_root.name):
+            name = session.save_emotion_data()
+        series = EmotionSeries(os.path.join(self.media_root.name, name))
+        self.assertIsInstance(series.frames, np.memmap)
+        self.assertEqual((series.emotions.shape, series.emotions.dtype), ((50, 7), np.float32))
+        self.assertEqual(series.timestamps.tolist(), sorted(series.timestamps.tolist()))
+        self.assertEqual(timestamp_ms('2026-01-01T10:00:00'), 1767261600000)
+
+        expected, actual = session.get_emotion_summary(include_sample=False), series.summary()
+        self.assertEqual(actual['questions'].keys(), expected['questions'].keys())
+        self.assertEqual(actual['total_frames_analyzed'], 120)
+        for label in EMOTION_LABELS:
+            self.assertAlmostEqual(actual['average_emotions'][label], expected['average_emotions'][label], places=3)
+            self.assertAlmostEqual(actual['questions']['12']['emotion_std'][label], expected['questions']['12']['emotion_std'][label], places=3)
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.media_root.name, 'emotion_data.json')
+        with open(path, 'w') as f:
+            json.dump({'emotion_history': []}, f)
+        with self.assertRaises(ValueError):
+            EmotionSeries(path)
+
+class ConvertEmotionDataTests(AttemptTestCase):
+    def test_json_files_are_converted(self):
+        history = [
+            {'timestamp': f"2026-01-01T10:00:0{second}", 'emotions': {'happy': 10.0 * second, 'sad': 5.0}}
+            for second in range(4)
+        ]
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            json_path = os.path.join(media_root, f'emotion_data_{self.attempt.id}.json')
+            with open(json_path, 'w') as f:
+                json.dump({'average_emotions': {}, 'emotion_history': history, 'total_frames_analyzed': 4}, f)
+            QuizAttempt.objects.filter(id=self.attempt.id).update(emotion_data_file=json_path)
+
+            call_command('convert_emotion_data', stdout=io.StringIO())
+
+            self.attempt.refresh_from_db()
+            self.assertFalse(os.path.exists(json_path))
+            summary = EmotionSeries(self.attempt.emotion_data_file.path).summary()
+            self.assertEqual(summary['total_frames_analyzed'], 4)
+            self.assertAlmostEqual(summary['average_emotions']['happy'], 15.0, places=4)
+            self.assertAlmostEqual(summary['emotion_std']['sad'], 0.0)
+
+    def test_malformed_files_are_skipped_without_losing_others(self):
+        other_quiz = Quiz.objects.create(story=self.quiz.story, title='Other')
+        broken = QuizAttempt.objects.create(user=self.user, quiz=other_quiz)
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            paths = {}
+            for attempt, history in [
+                (self.attempt, [{'timestamp': 1000, 'emotions': {'happy': 50.0}}]),
+                (broken, [{'timestamp': 1000}])  # no emotions
+            ]:
+                paths[attempt.id] = os.path.join(media_root, f'emotion_data_{attempt.id}.json')
+                with open(paths[attempt.id], 'w') as f:
+                    json.dump({'emotion_history': history}, f)
+                QuizAttempt.objects.filter(id=attempt.id).update(emotion_data_file=paths[attempt.id])
+
+            stderr = io.StringIO()
+            call_command('convert_emotion_data', '--batch-size', '1', stdout=io.StringIO(), stderr=stderr)
+
+            self.assertIn(f"Attempt {broken.id}: could not convert", stderr.getvalue())
+            self.attempt.refresh_from_db()
+            broken.refresh_from_db()
+            self.assertTrue(self.attempt.emotion_data_file.name.endswith('.emo'))
+            self.assertFalse(os.path.exists(paths[self.attempt.id]))
+            self.assertEqual(broken.emotion_data_file.name, paths[broken.id])
+            self.assertTrue(os.path.exists(paths[broken.id]))
+
+class EmotionSessionStoreTests(AttemptTestCase):
+    def test_sessions_are_shared_between_processes(self):
+        # Separate stores stand in for the web processes a load balancer spreads requests over
+        first, second = EmotionSessionStore(sample_size=5), EmotionSessionStore(sample_size=5)
+        question = self.questions[0].id
+        self.assertTrue(first.record(self.attempt.id, [{'happy': 100.0}] * 3, question_id=question))
+        self.assertTrue(second.record(self.attempt.id, [{'sad': 100.0}] * 4))
+
+        summary = first.find(self.attempt.id).get_emotion_summary()
+        self.assertEqual(summary['total_frames_analyzed'], 7)
+        self.assertAlmostEqual(summary['average_emotions']['sad'], 400 / 7)
+        self.assertEqual(summary['questions'][str(question)]['frames'], 3)
+        self.assertEqual(len(summary['frame_sample']), 5)
+
+        self.assertEqual(second.close(self.attempt.id).get_emotion_summary()['total_frames_analyzed'], 7)
+        self.assertIsNone(first.find(self.attempt.id))
+        self.assertIsNone(first.close(self.attempt.id))
+        self.assertEqual(first.stats()['active'], 0)
+
+    def test_frames_after_completion_are_dropped(self):
+        store = EmotionSessionStore()
+        QuizAttempt.objects.filter(id=self.attempt.id).update(completed=True, completed_at=timezone.now())
+        self.assertFalse(store.record(self.attempt.id, [{'happy': 100.0}]))
+        self.assertIsNone(store.find(self.attempt.id))
+        self.assertEqual(store.stats()['dropped'], 1)
+
+class EmotionFramesTests(AttemptTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frames_url = reverse('emotion-frames', args=[self.attempt.id])
+        for patcher in [
+            mock.patch.object(emotion_batcher, 'analyze', lambda frames: [{'happy': 80.0, 'neutral': 20.0} for _ in frames]),
+            mock.patch.object(emotion_model, 'state', 'ready')
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_streamed_frames_are_saved_with_the_completed_attempt(self):
+        response = self.client.post(self.frames_url, {'frames': [encode_frame(), encode_frame()]}, format='json')
+        self.assertEqual(response.data['frames_analyzed'], 2)
+        self.assertEqual(response.data['emotions'][0]['happy'], 80.0)
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            for question, letter in zip(self.questions, 'ABC'):
+                self.submit(question, letter)
+            self.attempt.refresh_from_db()
+            series = EmotionSeries(self.attempt.emotion_data_file.path)
+            self.assertEqual(series.summary()['total_frames_analyzed'], 2)
+            self.assertEqual(series.emotions[:, EMOTION_LABELS.index('happy')].tolist(), [80.0, 80.0])
+
+    def test_frames_are_summarized_per_question(self):
+        self.assertEqual(self.client.get(self.frames_url).status_code, 404)
+        question = self.questions[1]
+        self.client.post(self.frames_url, {'frames': [encode_frame()] * 3, 'question_id': question.id}, format='json')
+        self.client.post(self.frames_url, {'frames': [encode_frame()]}, format='json')
+
+        summary = self.client.get(self.frames_url).data
+        self.assertEqual(summary['total_frames_analyzed'], 4)
+        self.assertEqual(summary['questions'][str(question.id)]['dominant_emotion'], 'happy')
+        self.assertNotIn('frame_sample', summary)
+
+        other_quiz = Quiz.objects.create(story=self.quiz.story, title='Other')
+        elsewhere = Question.objects.create(quiz=other_quiz, question_text='Elsewhere?')
+        for question_id in (elsewhere.id, 'first'):
+            response = self.client.post(self.frames_url, {'frames': [encode_frame()], 'question_id': question_id}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_rejects_bad_frames_and_other_users_attempts(self):
+        self.assertEqual(self.client.post(self.frames_url, {'frames': ['not an image']}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.frames_url, {'frames': []}, format='json').status_code, 400)
+
+        other = get_user_model().objects.create_user(username='other', email='other@example.com', password='password')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(self.frames_url, {'frames': [encode_frame()]}, format='json').status_code, 404)
+
+    def test_frames_wait_for_the_model_to_warm_up(self):
+        with mock.patch.object(emotion_model, 'state', 'unloaded'), mock.patch.object(emotion_model, 'preload') as preload:
+            response = self.client.post(self.frames_url, {'frames': [encode_frame()]}, format='json')
+            self.assertEqual(response.status_code, 503)
+            preload.assert_called_once()
+            self.assertEqual(self.client.get(reverse('emotion-readiness')).status_code, 503)
+        self.assertEqual(self.client.get(reverse('emotion-readiness')).data['state'], 'ready')
+
+class FlakyBackend:
+    transient_errors = (ConnectionError,)
+
+    def __init__(self, failures, delay=0):
+        self.failures = failures
+        self.delay = delay
+        self.attempts = 0
+
+    def generate(self, model, contents, generation_config=None, timeout=None):
+        self.attempts += 1
+        time.sleep(self.delay)
+        if self.attempts <= self.failures:
+            raise ConnectionError("connection reset")
+        return 'ok'
+
+class LLMClientTests(SimpleTestCase):
+    def test_transient_errors_are_retried(self):
+        backend = FlakyBackend(failures=2)
+        client = LLMClient(backend, max_retries=2, backoff_base=0.001)
+        self.assertEqual(client.generate('prompt'), 'ok')
+        self.assertEqual(backend.attempts, 3)
+
+    def test_retries_are_bounded(self):
+        client = LLMClient(FlakyBackend(failures=5), max_retries=1, backoff_base=0.001)
+        with self.assertRaises(LLMError):
+            client.generate('prompt')
+
+    def test_deadline_covers_retries(self):
+        client = LLMClient(FlakyBackend(failures=5, delay=0.05), max_retries=10, backoff_base=0.001)
+        started = time.perf_counter()
+        with self.assertRaises(LLMTimeout):
+            client.generate('prompt', timeout=0.2)
+        self.assertLess(time.perf_counter() - started, 0.5)
@@ -1,17 +1,23 @@
 from django.urls import path
 from .views import (
-    StoryCreateView, QuizAttemptCreateView, SubmitAnswerView,
+    StoryCreateView, QuizAttemptCreateView, SubmitAnswerView, SubmitAnswersBatchView,
     QuizAttemptDetailView, UserQuizHistoryView, StartQuizAttemptView,
-    RegenerateQuizView, UserPointsView, LeaderboardView
+    RegenerateQuizView, UserPointsView, LeaderboardView,
+    GenerationJobDetailView, QuizStatsView, EmotionFramesView, EmotionReadinessView
 )
 
 urlpatterns = [
     path('stories/create/', StoryCreateView.as_view(), name='create-story'),
+    path('jobs/<int:pk>/', GenerationJobDetailView.as_view(), name='generation-job-detail'),
     path('attempts/create/', QuizAttemptCreateView.as_view(), name='create-attempt'),
     path('attempts/<int:attempt_id>/submit/', SubmitAnswerView.as_view(), name='submit-answer'),
+    path('attempts/<int:attempt_id>/submit/batch/', SubmitAnswersBatchView.as_view(), name='submit-answers-batch'),
+    path('attempts/<int:attempt_id>/frames/', EmotionFramesView.as_view(), name='emotion-frames'),
     path('attempts/<int:pk>/', QuizAttemptDetailView.as_view(), name='attempt-detail'),
     path('history/', UserQuizHistoryView.as_view(), name='quiz-history'),
     path('stories/<int:story_id>/regenerate/', RegenerateQuizView.as_view(), name='regenerate-quiz'),
     path('points/', UserPointsView.as_view(), name='user-points'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('stats/', QuizStatsView.as_view(), name='quiz-stats'),
+    path('emotions/ready/', EmotionReadinessView.as_view(), name='emotion-readiness'),
 ] 
\ No newline at end of file
@@ -1,215 +1,67 @@
 from django.shortcuts import render
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Story, Quiz, Question, QuizAttempt, Answer
+from .models import Story, Quiz, Question, QuizAttempt, Answer, QuizGenerationJob
 from .serializers import (
     StorySerializer, QuizSerializer, QuestionSerializer,
-    QuizAttemptSerializer, AnswerSerializer
+    QuizAttemptSerializer, QuizAttemptSummarySerializer, AnswerSerializer,
+    QuizGenerationJobSerializer
 )
-import google.generativeai as genai
 from django.conf import settings
-import PyPDF2
-import io
-from .video_processor import VideoProcessor
-import threading
-import time
-
-# Configure Gemini AI
-genai.configure(api_key=settings.GEMINI_API_KEY)
+from django.db import transaction
+from .jobs import fail_stale_jobs, is_stale, submit_generation_job, submit_pool_fill
+from .generation import question_generator
+from .persistence import create_quiz, question_payload
+from .generation_cache import generation_cache
+from .question_bank import assemble_quiz, pool_stats
+from .regeneration import regeneration_pool
+from accounts.leaderboard import WINDOWS, WindowedLeaderboard, leaderboard
+from accounts.models import UserFollow
+from studentapp_backend.llm import LLMError
+from .answer_keys import answer_keys
+from .submissions import AttemptCompleted, InvalidSubmission, submit_answer, submit_answers
+from .emotion_inference import decode_frame, emotion_batcher, emotion_model
+from .emotion_sessions import emotion_sessions
+from concurrent.futures import TimeoutError as InferenceTimeout
 
 class StoryCreateView(generics.CreateAPIView):
     serializer_class = StorySerializer
     permission_classes = (permissions.IsAuthenticated,)
 
     def create(self, request, *args, **kwargs):
-        # Read PDF content
-        pdf_file = request.FILES['pdf_file']
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        pdf_text = ""
-        for page in pdf_reader.pages:
-            pdf_text += page.extract_text()
-
-        # Get difficulty level
-        difficulty = request.data.get('difficulty', 'medium')
-        
-        # Generate story and questions using Gemini AI
-        model = genai.GenerativeModel('models/gemini-1.5-flash-8b-exp-0924')
-        
-        # Enhanced prompts for better question generation
-        difficulty_descriptions = {
-            'easy': "Generate 5 basic multiple-choice questions that test fundamental understanding. Focus on key terms, definitions, and basic concepts.",
-            'medium': "Generate 5 intermediate multiple-choice questions that require both understanding and application. Include questions that test relationships between concepts and practical applications.",
-            'hard': "Generate 5 challenging multiple-choice questions that require deep analysis. Include questions that combine multiple concepts and require critical thinking."
-        }
-        
-        prompt = f"""Based on the following text about algorithms and data structures, {difficulty_descriptions[difficulty]}
-
-        Rules for question generation:
-        1. Each question must have exactly 4 options (A, B, C, D)
-        2. One and only one option should be correct
-        3. All options should be plausible but clearly distinguishable
-        4. Questions should be relevant to the text content
-        5. For medium difficulty:
-           - Include some questions about relationships between concepts
-           - Ask about practical applications
-           - Test understanding of processes and procedures
-
-        Format each question exactly as follows (maintain this exact format):
-        Q1. [Question text]
-        A) [Option A]
-        B) [Option B]
-        C) [Option C]
-        D) [Option D]
-        Answer: [Correct option letter]
-
-        Text to analyze:
-        {pdf_text}"""
-        
-        try:
-            response = model.generate_content(prompt)
-            generated_content = response.text
-
-            # Create serializer with the data
-            serializer = self.get_serializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            
-            # Save the story with difficulty level
-            story_instance = serializer.save(
-                user=request.user,
-                generated_story=pdf_text,
-                difficulty=difficulty
-            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Text extraction, question generation and persistence run in the background
+        with transaction.atomic():
+            story_instance = serializer.save(user=request.user, generated_story='')
+            job = QuizGenerationJob.objects.create(user=request.user, story=story_instance)
+            submit_generation_job(job)
+
+        return Response({
+            'job_id': job.id,
+            'id': story_instance.id,
+            'title': story_instance.title,
+            'difficulty': story_instance.difficulty,
+            'status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
+
+class GenerationJobDetailView(generics.RetrieveAPIView):
+    serializer_class = QuizGenerationJobSerializer
+    permission_classes = (permissions.IsAuthenticated,)
 
-            # Create quiz
-            quiz = Quiz.objects.create(
-                story=story_instance,
-                title=f"Quiz for {story_instance.title} ({difficulty.capitalize()})"
-            )
+    def get_queryset(self):
+        return QuizGenerationJob.objects.filter(user=self.request.user).select_related('quiz')
 
-            # Parse and create questions
-            questions_data = []
-            questions = [q.strip() for q in generated_content.split('\n\n') if q.strip().startswith('Q')]
-            
-            for q in questions:
-                try:
-                    lines = [line.strip() for line in q.split('\n') if line.strip()]
-                    if len(lines) >= 6:
-                        # Extract question components
-                        question_text = lines[0].split('. ', 1)[1] if '. ' in lines[0] else lines[0]
-                        options = {}
-                        for i, opt in enumerate(lines[1:5]):
-                            if ') ' in opt:
-                                letter, text = opt.split(') ', 1)
-                                options[letter] = text
-                        
-                        # Extract correct answer
-                        correct_answer = lines[5].split(': ')[1].strip() if ': ' in lines[5] else ''
-                        
-                        # Validate all components are present
-                        if (len(options) == 4 and 
-                            all(key in options for key in ['A', 'B', 'C', 'D']) and 
-                            correct_answer in ['A', 'B', 'C', 'D']):
-                            
-                            question = Question.objects.create(
-                                quiz=quiz,
-                                question_text=question_text,
-                                option_a=options['A'],
-                                option_b=options['B'],
-                                option_c=options['C'],
-                                option_d=options['D'],
-                                correct_answer=correct_answer
-                            )
-                            
-                            # Add question data for response
-                            questions_data.append({
-                                'id': question.id,
-                                'text': question_text,
-                                'options': [
-                                    f"A) {options['A']}",
-                                    f"B) {options['B']}",
-                                    f"C) {options['C']}",
-                                    f"D) {options['D']}"
-                                ]
-                            })
-                except Exception as e:
-                    print(f"Error parsing question: {str(e)}")
-                    continue
-
-            # If no questions were created, try again with simplified prompt
-            if not questions_data:
-                simplified_prompt = f"""Generate 5 multiple-choice questions about this text. Each question must have exactly 4 options (A, B, C, D) and one correct answer.
-
-                Format:
-                Q1. [Question]
-                A) [Option]
-                B) [Option]
-                C) [Option]
-                D) [Option]
-                Answer: [A/B/C/D]
-
-                Text: {pdf_text}"""
-                
-                retry_response = model.generate_content(simplified_prompt)
-                retry_content = retry_response.text
-                
-                retry_questions = [q.strip() for q in retry_content.split('\n\n') if q.strip().startswith('Q')]
-                for q in retry_questions:
-                    try:
-                        lines = [line.strip() for line in q.split('\n') if line.strip()]
-                        if len(lines) >= 6:
-                            question_text = lines[0].split('. ', 1)[1] if '. ' in lines[0] else lines[0]
-                            options = {}
-                            for i, opt in enumerate(lines[1:5]):
-                                if ') ' in opt:
-                                    letter, text = opt.split(') ', 1)
-                                    options[letter] = text
-                            
-                            correct_answer = lines[5].split(': ')[1].strip() if ': ' in lines[5] else ''
-                            
-                            if (len(options) == 4 and 
-                                all(key in options for key in ['A', 'B', 'C', 'D']) and 
-                                correct_answer in ['A', 'B', 'C', 'D']):
-                                
-                                question = Question.objects.create(
-                                    quiz=quiz,
-                                    question_text=question_text,
-                                    option_a=options['A'],
-                                    option_b=options['B'],
-                                    option_c=options['C'],
-                                    option_d=options['D'],
-                                    correct_answer=correct_answer
-                                )
-                                
-                                # Add question data for response
-                                questions_data.append({
-                                    'id': question.id,
-                                    'text': question_text,
-                                    'options': [
-                                        f"A) {options['A']}",
-                                        f"B) {options['B']}",
-                                        f"C) {options['C']}",
-                                        f"D) {options['D']}"
-                                    ]
-                                })
-                    except Exception as e:
-                        print(f"Error parsing retry question: {str(e)}")
-                        continue
-
-            # Prepare the response
-            response_data = {
-                'id': story_instance.id,
-                'title': story_instance.title,
-                'story_text': pdf_text,
-                'difficulty': difficulty,
-                'questions': questions_data
-            }
-            
-            return Response(response_data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            print(f"Error generating questions: {str(e)}")
-            raise serializers.ValidationError("Failed to generate quiz questions. Please try again.")
+    def get_object(self):
+        job = super().get_object()
+        # A job lost to a restart would otherwise be polled forever. Only a stale job is
+        # written to, and the conditional update can't overwrite a job that just finished
+        if is_stale(job) and fail_stale_jobs(QuizGenerationJob.objects.filter(pk=job.pk)):
+            job.refresh_from_db()
+        return job
 
 class QuizAttemptCreateView(generics.CreateAPIView):
     serializer_class = QuizAttemptSerializer
@@ -220,52 +72,19 @@ class QuizAttemptCreateView(generics.CreateAPIView):
 
 class SubmitAnswerView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
-    video_processor = VideoProcessor()
 
     def post(self, request, attempt_id):
         try:
-            attempt = QuizAttempt.objects.get(id=attempt_id, user=request.user)
-            if attempt.completed:
-                return Response(
-                    {"error": "This quiz attempt has already been completed"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            question_id = request.data.get('question_id')
-            user_answer = request.data.get('answer')
-            emotions = request.data.get('emotions', {})
-
-            question = Question.objects.get(id=question_id, quiz=attempt.quiz)
-            is_correct = user_answer.lower().strip() == question.correct_answer.lower().strip()
-
-            Answer.objects.create(
-                attempt=attempt,
-                question=question,
-                user_answer=user_answer,
-                is_correct=is_correct
+            attempt, is_correct = submit_answer(
+                request.user,
+                attempt_id,
+                request.data.get('question_id'),
+                request.data.get('answer'),
+                request.data.get('emotions', {})
             )
 
-            # Update emotions log
-            current_emotions = attempt.emotions_log
-            current_emotions[str(question_id)] = emotions
-            attempt.emotions_log = current_emotions
-
-            # Check if all questions are answered
-            answered_questions = Answer.objects.filter(attempt=attempt).count()
-            total_questions = Question.objects.filter(quiz=attempt.quiz).count()
-
-            if answered_questions == total_questions:
-                attempt.completed = True
-                correct_answers = Answer.objects.filter(attempt=attempt, is_correct=True).count()
-                attempt.score = (correct_answers / total_questions) * 100
-                
-                # Stop video processing and save emotion data
-                self.video_processor.stop_capture()
-                emotion_file = self.video_processor.save_emotion_data(attempt.id)
-                if emotion_file:
-                    attempt.emotion_data_file = emotion_file
-
-            attempt.save()
+            if attempt.completed:
+                self.save_emotion_data(attempt)
 
             return Response({
                 "is_correct": is_correct,
@@ -273,6 +92,11 @@ class SubmitAnswerView(APIView):
                 "score": attempt.score if attempt.completed else None
             })
 
+        except (AttemptCompleted, InvalidSubmission) as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except QuizAttempt.DoesNotExist:
             return Response(
                 {"error": "Quiz attempt not found"},
@@ -289,45 +113,85 @@ class SubmitAnswerView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    def start_emotion_detection(self, attempt_id):
-        """Start emotion detection in a separate thread"""
+    def save_emotion_data(self, attempt):
+        """Attach the emotion data streamed during the attempt to it once it's completed"""
+        session = emotion_sessions.close(attempt.id)
+        emotion_file = session.save_emotion_data() if session else None
+        if emotion_file:
+            attempt.emotion_data_file = emotion_file
+            attempt.save(update_fields=['emotion_data_file'])
+
+class SubmitAnswersBatchView(SubmitAnswerView):
+    """Submit several answers of an attempt in one request: {"answers": [{question_id, answer, emotions}]}"""
+
+    def post(self, request, attempt_id):
         try:
-            self.video_processor.start_capture()
-            
-            def process_frames():
-                while self.video_processor.is_processing:
-                    self.video_processor.process_frame()
-                    time.sleep(0.1)  # Process at ~10 FPS
-
-            thread = threading.Thread(target=process_frames)
-            thread.daemon = True
-            thread.start()
-            
-            return True
-        except Exception as e:
-            print(f"Error starting emotion detection: {str(e)}")
-            return False
+            attempt, graded = submit_answers(request.user, attempt_id, request.data.get('answers'))
+
+            if attempt.completed:
+                self.save_emotion_data(attempt)
+
+            return Response({
+                "results": [
+                    {"question_id": question_id, "is_correct": is_correct}
+                    for question_id, is_correct in graded
+                ],
+                "completed": attempt.completed,
+                "score": attempt.score if attempt.completed else None
+            })
+
+        except (AttemptCompleted, InvalidSubmission) as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except QuizAttempt.DoesNotExist:
+            return Response(
+                {"error": "Quiz attempt not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Question.DoesNotExist:
+            return Response(
+                {"error": "Question not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
 class QuizAttemptDetailView(generics.RetrieveAPIView):
     serializer_class = QuizAttemptSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_queryset(self):
-        return QuizAttempt.objects.filter(user=self.request.user)
+        return QuizAttemptSerializer.setup_eager_loading(
+            QuizAttempt.objects.filter(user=self.request.user)
+        )
+
+class HistoryPagination(CursorPagination):
+    # Keyset pagination over the (user, completed, completed_at, id) index; completion
+    # times aren't unique (backfilled rows, concurrent completions), ids are
+    ordering = ('-completed_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
 
 class UserQuizHistoryView(generics.ListAPIView):
-    serializer_class = QuizAttemptSerializer
+    """Completed attempts, newest first, as summaries; ?expand=details embeds the quiz, questions and answers"""
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = HistoryPagination
+
+    def expanded(self):
+        return self.request.query_params.get('expand') == 'details'
+
+    def get_serializer_class(self):
+        return QuizAttemptSerializer if self.expanded() else QuizAttemptSummarySerializer
 
     def get_queryset(self):
-        return QuizAttempt.objects.filter(
-            user=self.request.user,
-            completed=True
-        ).order_by('-completed_at')
+        queryset = QuizAttempt.objects.filter(user=self.request.user, completed=True)
+        if self.expanded():
+            return QuizAttemptSerializer.setup_eager_loading(queryset)
+        return queryset.select_related('quiz__story')
 
 class StartQuizAttemptView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
-    video_processor = VideoProcessor()
 
     def post(self, request, quiz_id):
         try:
@@ -337,17 +201,10 @@ class StartQuizAttemptView(APIView):
                 quiz_id=quiz_id
             )
 
-            # Start emotion detection
-            if self.video_processor.start_emotion_detection(attempt.id):
-                return Response({
-                    "attempt_id": attempt.id,
-                    "message": "Quiz attempt started with emotion detection"
-                })
-            else:
-                return Response({
-                    "attempt_id": attempt.id,
-                    "message": "Quiz attempt started without emotion detection (camera unavailable)"
-                })
+            return Response({
+                "attempt_id": attempt.id,
+                "message": "Quiz attempt started; stream camera frames to the attempt's frames endpoint for emotion detection"
+            })
 
         except Exception as e:
             return Response(
@@ -355,66 +212,129 @@ class StartQuizAttemptView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+class EmotionFramesView(APIView):
+    """
+    Camera frames of an attempt in progress, captured and downsampled by the
+    client: JPEG/PNG files in multipart `frames`, or {"frames": [base64, ...],
+    "timestamps": [...]}, with the `question_id` on screen when they were
+    taken. The frames are analyzed in batches with those of other attempts
+    and the detected emotions returned per frame. GET returns the attempt's
+    emotion summary so far.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request, attempt_id):
+        owned = QuizAttempt.objects.filter(id=attempt_id, user=request.user).exists()
+        session = emotion_sessions.find(attempt_id) if owned else None
+        if session is None:
+            return Response(
+                {"error": "No emotion data for this quiz attempt"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(session.get_emotion_summary(include_sample=False))
+
+    def post(self, request, attempt_id):
+        quiz_id = QuizAttempt.objects.filter(
+            id=attempt_id, user=request.user, completed=False
+        ).values_list('quiz_id', flat=True).first()
+        if quiz_id is None:
+            return Response(
+                {"error": "Quiz attempt not found or already completed"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        question_id = request.data.get('question_id')
+        if question_id is not None:
+            # Bounds the per-question statistics to the quiz's own questions
+            if not str(question_id).isdigit() or int(question_id) not in answer_keys.get(quiz_id):
+                return Response(
+                    {"error": "question_id is not a question of this quiz"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            question_id = int(question_id)
+
+        if not emotion_model.ready:
+            emotion_model.preload()
+            return Response(
+                {"error": "Emotion detection is warming up, try again shortly"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'}
+            )
+
+        encoded = request.FILES.getlist('frames') or request.data.get('frames') or []
+        if not isinstance(encoded, list) or not 0 < len(encoded) <= settings.EMOTION_MAX_FRAMES_PER_REQUEST:
+            return Response(
+                {"error": f"Send between 1 and {settings.EMOTION_MAX_FRAMES_PER_REQUEST} frames"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        frames = [
+            decode_frame(data.read() if hasattr(data, 'read') else data, settings.EMOTION_FRAME_MAX_SIDE)
+            for data in encoded
+        ]
+        if any(frame is None for frame in frames):
+            return Response(
+                {"error": "Frames must be JPEG or PNG images"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            results = emotion_batcher.submit(frames).result(timeout=settings.EMOTION_INFERENCE_TIMEOUT)
+        except InferenceTimeout:
+            return Response(
+                {"error": "Emotion detection is busy, try again"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        timestamps = request.data.get('timestamps') if isinstance(request.data.get('timestamps'), list) else None
+        if not emotion_sessions.record(attempt_id, results, timestamps, question_id):
+            return Response(
+                {"error": "Quiz attempt not found or already completed"},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({"frames_analyzed": len(results), "emotions": results})
+
+class EmotionReadinessView(APIView):
+    """Readiness probe: 200 once this process has loaded and warmed the emotion model, 503 until then"""
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request):
+        return Response(
+            emotion_model.status(),
+            status=status.HTTP_200_OK if emotion_model.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
 class RegenerateQuizView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request, story_id):
         try:
             story = Story.objects.get(id=story_id, user=request.user)
-            
-            # Generate new questions using Gemini AI
-            model = genai.GenerativeModel('models/gemini-1.5-flash-8b-exp-0924')
-            prompt = f"""Based on the following text, generate 5 {story.difficulty} level multiple-choice questions with answers.
-            Format each question exactly as follows:
-            Q1. [Question text]
-            A) [Option A]
-            B) [Option B]
-            C) [Option C]
-            D) [Option D]
-            Answer: [Correct option letter]
-
-            Text to analyze:
-            {story.generated_story}"""
-            
-            response = model.generate_content(prompt)
-            generated_content = response.text
-
-            # Create new quiz
-            quiz = Quiz.objects.create(
-                story=story,
-                title=f"Quiz for {story.title} ({story.difficulty.capitalize()} - Regenerated)"
-            )
 
-            # Parse and create questions
-            questions = generated_content.split('\n\n')
-            for q in questions:
-                if q.strip().startswith('Q'):
-                    lines = [line.strip() for line in q.split('\n') if line.strip()]
-                    try:
-                        if len(lines) >= 6:
-                            question_text = lines[0].split('. ', 1)[1]
-                            option_a = lines[1].split(') ', 1)[1] if len(lines[1].split(') ', 1)) > 1 else 'Option A'
-                            option_b = lines[2].split(') ', 1)[1] if len(lines[2].split(') ', 1)) > 1 else 'Option B'
-                            option_c = lines[3].split(') ', 1)[1] if len(lines[3].split(') ', 1)) > 1 else 'Option C'
-                            option_d = lines[4].split(') ', 1)[1] if len(lines[4].split(') ', 1)) > 1 else 'Option D'
-                            correct_answer = lines[5].split(': ')[1] if len(lines[5].split(': ')) > 1 else 'A'
-
-                            Question.objects.create(
-                                quiz=quiz,
-                                question_text=question_text,
-                                option_a=option_a,
-                                option_b=option_b,
-                                option_c=option_c,
-                                option_d=option_d,
-                                correct_answer=correct_answer
-                            )
-                    except (IndexError, ValueError) as e:
-                        print(f"Error parsing question: {e}")
-                        continue
+            title = f"Quiz for {story.title} ({story.difficulty.capitalize()} - Regenerated)"
+
+            # Sampled from the story's question bank when it has been filled
+            assembled = assemble_quiz(story, title)
+            if assembled:
+                quiz, questions = assembled
+            else:
+                submit_pool_fill(story)
+                # The n-th quiz of a story is served from the pre-generated pool when it's ready
+                parsed_questions = regeneration_pool.questions(
+                    story.generated_story,
+                    story.difficulty,
+                    variant=story.quizzes.count()
+                )
+                quiz, questions = create_quiz(story, title, parsed_questions)
 
             return Response({
                 "message": "Quiz regenerated successfully",
-                "quiz_id": quiz.id
+                "quiz_id": quiz.id,
+                "questions": [question_payload(question) for question in questions]
             })
 
         except Story.DoesNotExist:
@@ -422,19 +342,84 @@ class RegenerateQuizView(APIView):
                 {"error": "Story not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except LLMError as e:
+            # Raised only when the bank is short and the variant had to be generated in the request
+            print(f"Error regenerating the quiz of story {story_id}: {str(e)}")
+            return Response(
+                {"error": "Quiz generation is unavailable right now, try again shortly"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '30'}
+            )
+
+def get_leaderboard(request):
+    """
+    The leaderboard selected by ?window=week|month|all (default all) and
+    ?scope=following (the user and the users they follow)
+    """
+    window = request.query_params.get('window', 'all')
+    scope = request.query_params.get('scope', 'everyone')
+    if window not in WINDOWS or scope not in ('everyone', 'following'):
+        raise ValueError("window must be week, month or all and scope everyone or following")
+    if scope == 'following':
+        user_ids = [request.user.id, *UserFollow.objects.filter(follower=request.user).values_list('following_id', flat=True)]
+        return WindowedLeaderboard(window, user_ids)
+    if window == 'all':
+        return leaderboard
+    return WindowedLeaderboard(window)
 
 class UserPointsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        points_obj, created = Points.objects.get_or_create(user=request.user)
-        serializer = PointsSerializer(points_obj)
-        return Response(serializer.data)
+        try:
+            board = get_leaderboard(request)
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        entry = board.rank(request.user)
+        if entry is None:
+            return Response(
+                {"error": "Profile not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(entry)
 
 class LeaderboardView(APIView):
+    """Leaderboard page: ?offset=0&limit=10 (limit up to LEADERBOARD_PAGE_MAX), see get_leaderboard for the rest"""
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        top_users = Points.objects.all().order_by('-total_points')[:10]
-        serializer = PointsSerializer(top_users, many=True)
-        return Response(serializer.data)
+        try:
+            board = get_leaderboard(request)
+            offset = max(0, int(request.query_params.get('offset', 0)))
+            limit = min(max(1, int(request.query_params.get('limit', 10))), settings.LEADERBOARD_PAGE_MAX)
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = board.page(offset, limit)
+        return Response({
+            'offset': offset,
+            'limit': limit,
+            'next_offset': offset + limit if len(results) == limit else None,
+            'results': results
+        })
+
+class QuizStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'generation_cache': generation_cache.stats(),
+            'question_generation': question_generator.stats(),
+            'regeneration_pool': regeneration_pool.stats(),
+            'question_bank': pool_stats(),
+            'answer_keys': answer_keys.stats(),
+            'emotion_inference': {**emotion_batcher.stats(), 'model': emotion_model.status()},
+            'emotion_sessions': emotion_sessions.stats()
+        })
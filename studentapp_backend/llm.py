@@ -0,0 +1,178 @@
+"""
+Shared LLM client used by every app that talks to a language model.
+
+One process-wide client reuses the configured backend and its connections.
+Each call gets a deadline that covers waiting for a concurrency slot,
+retries of transient failures (with jittered exponential backoff) and the
+requests themselves, so a slow provider cannot block a worker indefinitely.
+
+Backends are selected with the LLM_BACKEND setting:
+- 'gemini': Google Gemini through google-generativeai
+- 'stub': deterministic local responses for tests and load runs
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+class LLMError(Exception):
+    pass
+
+class LLMTimeout(LLMError):
+    pass
+
+class GeminiBackend:
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._genai = None
+        self._models = {}
+        self._lock = threading.Lock()
+
+        from google.api_core import exceptions
+        self.transient_errors = (
+            exceptions.TooManyRequests,
+            exceptions.ResourceExhausted,
+            exceptions.ServiceUnavailable,
+            exceptions.InternalServerError,
+            exceptions.DeadlineExceeded,
+        )
+
+    def _model(self, name):
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._genai = genai
+            if name not in self._models:
+                self._models[name] = self._genai.GenerativeModel(name)
+            return self._models[name]
+
+    def generate(self, model, contents, generation_config=None, timeout=None):
+        response = self._model(model).generate_content(
+            contents,
+            generation_config=generation_config,
+            request_options={'timeout': timeout}
+        )
+        try:
+            return response.text
+        except ValueError as e:
+            # Raised when the response has no text, e.g. a safety-blocked prompt or candidate
+            raise LLMError(f"Gemini returned no text: {str(e)}") from e
+
+class StubBackend:
+    """
+    Deterministic offline backend: the same prompt always yields the same response.
+    Quiz-shaped output is returned as JSON when JSON is requested, otherwise in
+    the "Q1. / A) / Answer:" text layout.
+    """
+    transient_errors = ()
+
+    def __init__(self, latency=0):
+        self.latency = latency
+
+    def _questions(self, seed, count=5):
+        rng = random.Random(seed)
+        return [
+            {
+                'question': f"Stub question {index + 1} ({rng.randrange(10 ** 6)})?",
+                'options': [f"Stub option {letter}{rng.randrange(1000)}" for letter in 'ABCD'],
+                'answer': rng.choice('ABCD')
+            }
+            for index in range(count)
+        ]
+
+    def generate(self, model, contents, generation_config=None, timeout=None):
+        if self.latency:
+            time.sleep(min(self.latency, timeout) if timeout else self.latency)
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        seed = hashlib.sha256(f"{model}:{prompt}".encode()).hexdigest()
+        questions = self._questions(seed)
+
+        if (generation_config or {}).get('response_mime_type') == 'application/json':
+            return json.dumps(questions)
+        return '\n\n'.join(
+            f"Q{index}. {question['question']}\n" +
+            '\n'.join(f"{letter}) {option}" for letter, option in zip('ABCD', question['options'])) +
+            f"\nAnswer: {question['answer']}"
+            for index, question in enumerate(questions, start=1)
+        )
+
+BACKENDS = {
+    'gemini': lambda: GeminiBackend(settings.GEMINI_API_KEY),
+    'stub': lambda: StubBackend(latency=settings.LLM_STUB_LATENCY),
+}
+
+class LLMClient:
+    def __init__(self, backend, default_model=None, timeout=60, max_retries=2,
+                 max_concurrency=4, backoff_base=0.5, backoff_max=8):
+        self.backend = backend
+        self.default_model = default_model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _backoff(self, attempt):
+        # "Full jitter": spread retries of concurrent callers across the window
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def generate(self, contents, model=None, generation_config=None, timeout=None):
+        """Return the response text, raising LLMTimeout once the call's deadline has passed"""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        transient_errors = (TimeoutError, ConnectionError) + tuple(self.backend.transient_errors)
+
+        if not self._slots.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise LLMTimeout("Timed out waiting for a free LLM slot")
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeout("LLM call exceeded its deadline")
+                try:
+                    return self.backend.generate(
+                        model or self.default_model,
+                        contents,
+                        generation_config=generation_config,
+                        timeout=remaining
+                    )
+                except LLMError:
+                    raise
+                except transient_errors as e:
+                    if attempt >= self.max_retries:
+                        raise LLMError(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                    delay = self._backoff(attempt)
+                    if time.monotonic() + delay >= deadline:
+                        raise LLMTimeout(f"LLM call exceeded its deadline: {e}") from e
+                    time.sleep(delay)
+                    attempt += 1
+                except Exception as e:
+                    # Anything else the backend raises fails this call, not the caller's whole job
+                    raise LLMError(f"LLM call failed: {e!r}") from e
+        finally:
+            self._slots.release()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            backend = settings.LLM_BACKEND
+            factory = BACKENDS.get(backend) or import_string(backend)
+            _client = LLMClient(
+                factory(),
+                default_model=settings.LLM_DEFAULT_MODEL,
+                timeout=settings.LLM_TIMEOUT,
+                max_retries=settings.LLM_MAX_RETRIES,
+                max_concurrency=settings.LLM_MAX_CONCURRENCY
+            )
+        return _client
+
+def generate(contents, model=None, generation_config=None, timeout=None):
+    return get_client().generate(contents, model=model, generation_config=generation_config, timeout=timeout)
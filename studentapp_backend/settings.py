@@ -36,6 +36,61 @@ ALLOWED_HOSTS = ['172.16.45.68', 'localhost', '127.0.0.1']
 # Gemini API Key
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# Shared LLM client (see studentapp_backend/llm.py)
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')  # 'gemini', 'stub' or a dotted path to a backend factory
+LLM_DEFAULT_MODEL = 'models/gemini-1.5-flash-8b-exp-0924'
+LLM_TIMEOUT = int(os.getenv('LLM_TIMEOUT', 60))  # seconds per call, including retries
+LLM_MAX_RETRIES = 2
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+LLM_STUB_LATENCY = float(os.getenv('LLM_STUB_LATENCY', 0))
+
+# Background quiz generation
+QUIZ_GENERATION_WORKERS = int(os.getenv('QUIZ_GENERATION_WORKERS', 2))
+QUIZ_BACKGROUND_WORKERS = int(os.getenv('QUIZ_BACKGROUND_WORKERS', 1))  # question bank fills and regenerate variants
+QUIZ_GENERATION_JOB_TIMEOUT = int(os.getenv('QUIZ_GENERATION_JOB_TIMEOUT', 15 * 60))  # seconds before a pending or running job counts as lost
+QUIZ_CHUNK_TOKENS = 6000  # estimated prompt tokens of source text per generation call
+QUIZ_MAX_CHUNKS = 8  # longer documents are sampled evenly across their sections
+QUIZ_CHUNK_WORKERS = int(os.getenv('QUIZ_CHUNK_WORKERS', LLM_MAX_CONCURRENCY))
+
+# PDF text extraction
+PDF_MAX_BYTES = 25 * 1024 * 1024
+PDF_MAX_PAGES = 500
+PDF_MAX_TEXT_CHARS = 2_000_000
+PDF_PARALLEL_PAGE_THRESHOLD = 32  # smaller documents are extracted in-thread
+PDF_PAGES_PER_TASK = 16
+PDF_EXTRACTION_PROCESSES = int(os.getenv('PDF_EXTRACTION_PROCESSES', os.cpu_count() or 2))
+
+# Cache of extracted PDF text and generated questions, keyed by PDF hash
+QUIZ_CACHE_DIR = os.getenv('QUIZ_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'quiz'))
+QUIZ_CACHE_MAX_ENTRIES = 256
+QUIZ_CACHE_MAX_MEMORY_BYTES = 64 * 1024 * 1024  # serialized size of the in-memory tier; larger texts stay on disk only
+QUIZ_CACHE_MAX_DISK_ENTRIES = 5000
+QUIZ_CACHE_TTL = 30 * 24 * 3600
+QUIZ_REGENERATE_POOL_SIZE = 2  # alternative quizzes kept ready per story text and difficulty
+
+# Per-quiz answer keys kept in memory for grading
+ANSWER_KEY_CACHE_SIZE = 1024
+ANSWER_KEY_CACHE_TTL = 300  # seconds; bounds staleness after question edits made in other processes
+
+# Leaderboard (see accounts/leaderboard.py)
+LEADERBOARD_SIZE = 100  # entries kept in the in-process top snapshot
+LEADERBOARD_TTL = 30  # seconds before the snapshot is rebuilt even without local point changes
+LEADERBOARD_PAGE_MAX = 100
+
+# Question banks that new quizzes are sampled from (see quiz/question_bank.py)
+QUESTION_POOL_TARGET = int(os.getenv('QUESTION_POOL_TARGET', 30))  # questions per story and difficulty
+
+# Emotion detection on camera frames streamed by clients (see quiz/emotion_inference.py)
+# Build and warm the model when the process starts rather than on the first frames; set on web workers
+EMOTION_PRELOAD = os.getenv('EMOTION_PRELOAD', 'false').lower() in ('1', 'true')
+EMOTION_BATCH_SIZE = int(os.getenv('EMOTION_BATCH_SIZE', 16))  # frames per emotion model call
+EMOTION_BATCH_WAIT = 0.05  # seconds a partial batch waits for frames from other attempts
+EMOTION_MAX_FRAMES_PER_REQUEST = 32
+EMOTION_FRAME_MAX_SIDE = 320  # larger frames are downscaled before detection
+EMOTION_INFERENCE_TIMEOUT = 10  # seconds a request waits for its frames' results
+EMOTION_INFERENCE_WORKERS = int(os.getenv('EMOTION_INFERENCE_WORKERS', 2))
+EMOTION_SESSION_SAMPLE_SIZE = 100  # raw frames kept per attempt, sampled uniformly, next to the running statistics
+
 # Application definition
 
 INSTALLED_APPS = [